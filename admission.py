@@ -0,0 +1,177 @@
+# admission.py - Quota-aware admission control for Gemini calls
+#
+# Requests are admitted while the requests-per-minute and tokens-per-minute
+# budgets and the concurrency limit allow it. Others wait in a bounded queue
+# until their deadline; when the queue is full they are rejected straight
+# away so the caller can answer 429 instead of piling onto the upstream quota.
+import asyncio
+import os
+import threading
+import time
+
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', '60'))
+GEMINI_TPM = int(os.getenv('GEMINI_TPM', '1000000'))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+GEMINI_MAX_QUEUE = int(os.getenv('GEMINI_MAX_QUEUE', '20'))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', '30'))
+ESTIMATED_TOKENS_PER_REQUEST = int(os.getenv('GEMINI_ESTIMATED_TOKENS', '8000'))
+
+POLL_INTERVAL = 0.05  # seconds between admission checks while queued
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; retry_after is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Token-bucket rate limiting plus an adaptive (AIMD) concurrency limit.
+
+    Thread-safe, so the per-request event loops of Flask async views and the
+    blocking wrappers can all share one instance.
+    """
+
+    def __init__(self, rpm, tpm, max_concurrency, max_queue, queue_timeout):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._request_tokens = float(rpm)
+        self._token_tokens = float(tpm)
+        self._last_refill = time.monotonic()
+        self._limit = float(max_concurrency)  # adaptive concurrency limit
+        self._in_flight = 0
+        self._waiting = 0
+        self.stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+                      'overload_signals': 0}
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_tokens = min(self.rpm, self._request_tokens + elapsed * self.rpm / 60)
+        self._token_tokens = min(self.tpm, self._token_tokens + elapsed * self.tpm / 60)
+
+    def _try_admit(self, estimated_tokens, takes_slot=True):
+        """Admit if possible; return (admitted, seconds until budget is likely free)"""
+        now = time.monotonic()
+        self._refill(now)
+        estimated_tokens = min(estimated_tokens, self.tpm)
+        if takes_slot and self._in_flight >= int(self._limit):
+            return False, POLL_INTERVAL
+        if self._request_tokens < 1:
+            return False, (1 - self._request_tokens) * 60 / self.rpm
+        if self._token_tokens < estimated_tokens:
+            return False, (estimated_tokens - self._token_tokens) * 60 / self.tpm
+        self._request_tokens -= 1
+        self._token_tokens -= estimated_tokens
+        if takes_slot:
+            self._in_flight += 1
+        self.stats['admitted'] += 1
+        return True, 0
+
+    def _retry_after(self):
+        # Rough time for the queue ahead of a new arrival to drain at the RPM rate
+        return max(1, int((self._waiting + 1) * 60 / self.rpm))
+
+    async def acquire(self, estimated_tokens=ESTIMATED_TOKENS_PER_REQUEST, takes_slot=True):
+        """
+        Wait for admission, or raise AdmissionRejected
+
+        takes_slot=False charges only the request and token budgets, for a follow-up
+        call made from a concurrency slot the caller already holds (a model escalation);
+        waiting for a second slot there could wait on the caller's own.
+        """
+        with self._lock:
+            admitted, wait = self._try_admit(estimated_tokens, takes_slot)
+            if admitted:
+                return
+            if self._waiting >= self.max_queue:
+                self.stats['rejected_queue_full'] += 1
+                raise AdmissionRejected('Server is busy, please retry shortly', self._retry_after())
+            self._waiting += 1
+
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self.stats['rejected_timeout'] += 1
+                        retry_after = self._retry_after()
+                    raise AdmissionRejected('Timed out waiting for model quota', retry_after)
+                await asyncio.sleep(min(max(wait, POLL_INTERVAL), remaining))
+                with self._lock:
+                    admitted, wait = self._try_admit(estimated_tokens, takes_slot)
+                if admitted:
+                    return
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def check(self):
+        """Raise AdmissionRejected if acquire() would turn a new request away right now (reserves nothing)"""
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self.stats['rejected_queue_full'] += 1
+                raise AdmissionRejected('Server is busy, please retry shortly', self._retry_after())
+
+    def try_acquire(self, estimated_tokens=ESTIMATED_TOKENS_PER_REQUEST):
+        """Admit only if budget is free right now and nobody is queued; never waits"""
+        with self._lock:
+            if self._waiting:
+                return False
+            admitted, _ = self._try_admit(estimated_tokens)
+            return admitted
+
+    def release(self, estimated_tokens=ESTIMATED_TOKENS_PER_REQUEST, actual_tokens=None, overloaded=False,
+                takes_slot=True):
+        """
+        Mark a call finished, correct the token budget and adapt concurrency
+
+        Args:
+            estimated_tokens: What was charged at admission
+            actual_tokens: Tokens reported by the model, if known
+            overloaded: True if upstream answered 429/503
+            takes_slot: False for a call admitted with acquire(takes_slot=False)
+        """
+        with self._lock:
+            if takes_slot:
+                self._in_flight -= 1
+            if actual_tokens is not None:
+                # Refund (or charge) the difference from the estimate
+                self._token_tokens = min(self.tpm, self._token_tokens + estimated_tokens - actual_tokens)
+            if overloaded:
+                # Multiplicative decrease, and stop handing out the rest of this minute's requests
+                self.stats['overload_signals'] += 1
+                self._limit = max(1.0, self._limit / 2)
+                self._request_tokens = min(self._request_tokens, 0)
+            else:
+                # Additive increase back towards the configured maximum
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / max(self._limit, 1))
+
+    def snapshot(self):
+        """Current state, for metrics"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return dict(self.stats, in_flight=self._in_flight, waiting=self._waiting,
+                        concurrency_limit=int(self._limit),
+                        requests_available=int(self._request_tokens),
+                        tokens_available=int(self._token_tokens))
+
+
+def is_overload_error(error):
+    """True if an exception from the model SDK is a 429/503 (quota or overload) response"""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    return code in (429, 503)
+
+
+gemini_admission = AdmissionController(
+    GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE, GEMINI_QUEUE_TIMEOUT
+)
@@ -1,12 +1,44 @@
 # app.py - Main Flask application
-from flask import Flask, render_template_string, request, send_file, jsonify
+from flask import Flask, render_template_string, request, send_file, jsonify, Response, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
+import asyncio
 import os
 import json
-from pdf_gemini_analysis import process_pdf_with_gemini
-from populate_template import populate_markdown_template
-from notion_importer import import_to_notion
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from incremental import extract_with_page_tracking
+from notion_importer import import_to_notion_async, import_courses_to_notion_async, course_page_title
+import result_store
+import serialization
+from admission import AdmissionRejected, gemini_admission
+from hedging import gemini_hedging
+from model_cascade import cascade_stats
+from circuit_breaker import CircuitOpenError, gemini_breaker, notion_breaker
+from prompt_cache import prompt_cache
+from deadlines import Deadline, StageTimeout, run_stage, timeout_snapshot
+from batching import batch_stats, gemini_batcher
+from due_dates import DEFAULT_LIMIT, due_date_index, window_end
+from datetime import datetime
+import memory_diagnostics
+from memory_diagnostics import stage, track_request
+import backends
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses the fast encoder from serialization.py"""
+    
+    def dumps(self, obj, **kwargs):
+        return serialization.dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return serialization.loads(s)
 
 app = Flask(__name__)
+if serialization.orjson is not None:
+    app.json = FastJSONProvider(app)
+
+# Pre-fork servers can import the SDKs once in the master process
+if os.getenv('SYLLABOSS_WARM_UP') == '1':
+    backends.warm_up()
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 HTML_TEMPLATE = '''
@@ -333,12 +365,16 @@ HTML_TEMPLATE = '''
                     if (result.notion_url) {
                         successDetails.innerHTML = `
                             Template: ${result.template}<br>
-                            <strong>Notion Page:</strong> <a href="${result.notion_url}" target="_blank">Open in Notion</a>
+                            <strong>Notion Page:</strong> <a href="${result.notion_url}" target="_blank">Open in Notion</a><br>
+                            Try another look: ${switchLinks(result)}
                         `;
+                        readyForNext();
                     } else if (result.download_url) {
                         successDetails.innerHTML = `
                             Template: ${result.template}<br>
-                            <strong>Downloading markdown file...</strong>
+                            ${result.notion_error ? result.notion_error + '<br>' : ''}
+                            <strong>Downloading markdown file...</strong><br>
+                            Try another look: ${switchLinks(result)}
                         `;
                         
                         // Trigger download
@@ -349,10 +385,8 @@ HTML_TEMPLATE = '''
                         a.click();
                         document.body.removeChild(a);
                         
-                        // Reset form after 2 seconds
-                        setTimeout(() => {
-                            resetForm();
-                        }, 2000);
+                        // Ready for the next upload, but keep the template links on screen
+                        readyForNext();
                     }
                 } else {
                     throw new Error(result.error || 'Processing failed');
@@ -364,12 +398,24 @@ HTML_TEMPLATE = '''
             }
         });
         
-        function resetForm() {
+        function switchLinks(result) {
+            // Re-render the stored result with another template, without re-uploading
+            return ['modern', 'classic', 'basic']
+                .filter(name => name !== result.template)
+                .map(name => `<a href="/download/${result.result_id}/${name}">${name}</a>`)
+                .join(' | ');
+        }
+        
+        function readyForNext() {
             submitBtn.disabled = false;
             submitBtn.textContent = 'Upload & Process Syllabus';
             form.reset();
             fileText.textContent = 'Choose PDF file...';
             fileName.textContent = '';
+        }
+        
+        function resetForm() {
+            readyForNext();
             successMessage.style.display = 'none';
         }
     </script>
@@ -382,12 +428,19 @@ def index():
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/process', methods=['POST'])
-def process():
+async def process():
     """Handle the actual processing and return JSON response"""
+    with track_request('process'):
+        return await process_upload()
+
+async def process_upload():
+    deadline = Deadline()
     try:
         # Get selected template
         selected_template = request.form.get('template', 'modern')
         notion_api_key = request.form.get('notion_api_key', '').strip()
+        # Set when uploading a new version of an already processed syllabus
+        previous_result_id = request.form.get('previous_result_id', '').strip()
         
         # Get uploaded file
         if 'pdf_file' not in request.files:
@@ -401,46 +454,274 @@ def process():
         if not file.filename.endswith('.pdf'):
             return jsonify({'success': False, 'error': 'File must be a PDF'})
         
+        if result_store.template_path_for(selected_template) is None:
+            return jsonify({'success': False, 'error': 'Template not found'})
+        
         # Read the file data
-        pdf_data = file.read()
+        with stage('read_upload'):
+            pdf_data = file.read()
+            pdf_hash = hashlib.sha256(pdf_data).hexdigest()
         
         # Process with Gemini
-        extracted_data, error, output_file = process_pdf_with_gemini(pdf_data, selected_template)
+        try:
+            previous = result_store.get_revision_base(previous_result_id) if previous_result_id else None
+            with stage('extraction'):
+                extracted_data, error, output_file, page_state = await run_stage(
+                    deadline, 'extraction', extract_with_page_tracking(pdf_data, selected_template, previous)
+                )
+        except AdmissionRejected as e:
+            # Fail fast so the client backs off instead of waiting on the quota
+            return retry_later_response(str(e), e.retry_after, 429)
+        except CircuitOpenError as e:
+            # Gemini is down: serve an earlier extraction of the same PDF, or fail fast
+            cached_result_id = result_store.find_result_for_pdf(pdf_hash)
+            if cached_result_id:
+                return await render_result(cached_result_id, selected_template, notion_api_key, {'cached': True},
+                                           deadline)
+            return retry_later_response(str(e), e.retry_after, 503)
         
         if error:
             return jsonify({'success': False, 'error': f'Failed to process PDF: {error}'})
         
-        # Populate markdown template
-        template_path = f'notion_templates/notion_template_{selected_template}.md'
-        markdown_output = 'output/filled-in-template.md'
-        os.makedirs('output', exist_ok=True)
+        # Keep the extracted data so other templates can be rendered later
+        result_id = result_store.save_result(extracted_data, page_state, pdf_hash,
+                                             replaces=previous_result_id if previous else None)
         
-        if not os.path.exists(template_path):
-            return jsonify({'success': False, 'error': 'Template not found'})
+        return await render_result(result_id, selected_template, notion_api_key, deadline=deadline)
+    
+    except StageTimeout as e:
+        return stage_timeout_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/metrics/admission')
+def admission_metrics():
+    """Current Gemini admission-control state"""
+    return jsonify(gemini_admission.snapshot())
+
+@app.route('/metrics/hedging')
+def hedging_metrics():
+    """Hedged-request rate and win rate for Gemini generation calls"""
+    return jsonify(gemini_hedging.snapshot())
+
+@app.route('/metrics/breakers')
+def breaker_metrics():
+    """Circuit breaker state for Gemini and Notion"""
+    return jsonify({'gemini': gemini_breaker.snapshot(), 'notion': notion_breaker.snapshot()})
+
+@app.route('/metrics/prompt-cache')
+def prompt_cache_metrics():
+    """Prompt context cache usage and input tokens saved"""
+    return jsonify(prompt_cache.snapshot())
+
+@app.route('/metrics/timeouts')
+def timeout_metrics():
+    """Stage timeouts since startup"""
+    return jsonify(timeout_snapshot())
+
+@app.route('/metrics/batching')
+def batching_metrics():
+    """Batched extraction counters (documents per call, individual fallbacks)"""
+    return jsonify(dict(batch_stats.snapshot(), enabled=gemini_batcher.enabled))
+
+@app.route('/metrics/models')
+def model_metrics():
+    """Per-model cascade counters (how much traffic the cheap tier absorbs)"""
+    return jsonify(cascade_stats.snapshot())
+
+MEMORY_GROUP_BY = ('lineno', 'filename', 'traceback')
+
+def memory_admin_error():
+    """Error response unless diagnostics are on and the admin token was supplied, else None"""
+    if not memory_diagnostics.MEMORY_DIAGNOSTICS:
+        return jsonify({'success': False, 'error': 'Memory diagnostics are off (set MEMORY_DIAGNOSTICS=1)'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not memory_diagnostics.check_admin_token(supplied):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    if request.args.get('group_by', 'lineno') not in MEMORY_GROUP_BY:
+        return jsonify({'success': False, 'error': f'group_by must be one of {", ".join(MEMORY_GROUP_BY)}'}), 400
+    return None
+
+@app.route('/admin/memory')
+def memory_report():
+    """Per-stage and per-request memory figures plus the top allocation sites"""
+    error = memory_admin_error()
+    if error:
+        return error
+    return jsonify(memory_diagnostics.report(request.args.get('limit', 20, type=int),
+                                             request.args.get('group_by', 'lineno')))
+
+@app.route('/admin/memory/snapshots', methods=['POST'])
+def memory_snapshot():
+    """Save a snapshot under ?label=... for later diffs"""
+    error = memory_admin_error()
+    if error:
+        return error
+    label = request.args.get('label') or datetime.now().isoformat(timespec='seconds')
+    return jsonify(memory_diagnostics.save_snapshot(label))
+
+@app.route('/admin/memory/diff')
+def memory_diff():
+    """Allocation growth between ?from=<label> and ?to=<label> (default: now)"""
+    error = memory_admin_error()
+    if error:
+        return error
+    sites, error = memory_diagnostics.diff_snapshots(
+        request.args.get('from', ''), request.args.get('to') or None,
+        request.args.get('limit', 20, type=int), request.args.get('group_by', 'lineno')
+    )
+    if error:
+        return jsonify({'success': False, 'error': error}), 404
+    return jsonify({'success': True, 'sites': sites})
+
+@app.route('/render', methods=['GET', 'POST'])
+async def render():
+    """Re-render a stored result with another template (no re-extraction)"""
+    try:
+        result_id = request.values.get('result_id', '')
+        selected_template = request.values.get('template', 'modern')
+        # Notion pushes only from POST form data, so tokens stay out of URLs and access logs
+        notion_api_key = request.form.get('notion_api_key', '').strip() if request.method == 'POST' else ''
         
-        markdown_content = populate_markdown_template(output_file, template_path, markdown_output)
+        if not result_id:
+            return jsonify({'success': False, 'error': 'No result_id given'})
         
-        # Import to Notion if API key provided
-        if notion_api_key:
-            success, notion_url, notion_error = import_to_notion(markdown_content, notion_api_key)
-            if not success:
-                return jsonify({'success': False, 'error': f'Notion import failed: {notion_error}'})
-            
-            return jsonify({
-                'success': True,
-                'template': selected_template,
-                'notion_url': notion_url
-            })
-        else:
-            # Return download URL instead of sending file directly
+        # Plain link clicks get the file straight back
+        if request.values.get('download'):
+            return redirect(url_for('download_result', result_id=result_id, template=selected_template))
+        
+        return await render_result(result_id, selected_template, notion_api_key, deadline=Deadline())
+        
+    except StageTimeout as e:
+        return stage_timeout_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/bulk-import', methods=['POST'])
+async def bulk_import():
+    """Import several stored results into Notion under one parent page"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        result_ids = payload.get('result_ids') or []
+        selected_template = payload.get('template', 'modern')
+        notion_api_key = (payload.get('notion_api_key') or '').strip()
+        parent_title = payload.get('parent_title') or 'Courses'
+        
+        if not result_ids or not notion_api_key:
+            return jsonify({'success': False, 'error': 'result_ids and notion_api_key are required'})
+        
+        courses = []
+        for result_id in result_ids:
+            markdown_content, error = result_store.get_rendered(result_id, selected_template)
+            if error:
+                return jsonify({'success': False, 'error': f'{result_id}: {error}'})
+            courses.append((course_page_title(result_store.get_data(result_id)), markdown_content))
+        
+        summary = await import_courses_to_notion_async(courses, notion_api_key, parent_title)
+        if summary.get('error'):
+            return jsonify({'success': False, 'error': f"Notion import failed: {summary['error']}"})
+        
+        return jsonify(dict(summary, success=True))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/upcoming')
+def upcoming():
+    """Next deadlines across stored courses, in time order"""
+    try:
+        result_ids = [result_id for result_id in request.args.get('result_ids', '').split(',') if result_id]
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+        days = float(request.args.get('days', 0))
+        start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else datetime.now()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid query: {e}'}), 400
+    
+    deadlines = due_date_index.upcoming(result_ids or None, start, window_end(start, days), limit)
+    return jsonify({'success': True, 'from': start.isoformat(timespec='minutes'), 'deadlines': deadlines})
+
+def retry_later_response(error, retry_after, status_code):
+    """JSON error with a Retry-After header"""
+    response = jsonify({'success': False, 'error': error, 'retry_after': retry_after})
+    response.status_code = status_code
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def stage_timeout_response(error):
+    """504 naming the stage that ran out of time"""
+    response = jsonify({'success': False, 'error': str(error), 'timed_out_stage': error.stage})
+    response.status_code = 504
+    return response
+
+NOTION_UNAVAILABLE = 'Notion is unavailable right now, so the markdown file is provided instead'
+
+# Renders run here rather than in the loop's default executor: each request's
+# event loop waits for default-executor threads when it closes, which would hold
+# a timed-out response until the slow render finished anyway
+_render_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='render')
+
+async def render_result(result_id, selected_template, notion_api_key, extra=None, deadline=None):
+    """Render a stored result, then import it to Notion or expose it for download"""
+    deadline = deadline or Deadline()
+    with stage('render'):
+        # On a worker thread so RENDER_BUDGET_SECONDS can cut a slow render short
+        rendering = asyncio.get_running_loop().run_in_executor(
+            _render_executor, result_store.get_rendered, result_id, selected_template
+        )
+        markdown_content, error = await run_stage(deadline, 'render', rendering)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    
+    extra = dict(extra or {})
+    if notion_api_key and notion_breaker.is_open():
+        # Don't wait on a dead Notion; hand back the markdown straight away
+        extra['notion_error'] = NOTION_UNAVAILABLE
+        notion_api_key = ''
+    
+    markdown_output = 'output/filled-in-template.md'
+    os.makedirs('output', exist_ok=True)
+    with open(markdown_output, 'w', encoding='utf-8') as f:
+        f.write(markdown_content)
+    
+    # Import to Notion if API key provided
+    if notion_api_key:
+        title = course_page_title(result_store.get_data(result_id))
+        try:
+            with stage('notion'):
+                success, notion_url, notion_error = await run_stage(
+                    deadline, 'notion', import_to_notion_async(markdown_content, notion_api_key, title)
+                )
+        except StageTimeout as e:
+            # Out of time for Notion: still hand back the markdown
+            success, notion_url = None, None
+            extra.update(notion_error=str(e), timed_out_stage=e.stage)
+        except CircuitOpenError:
+            # The breaker opened while this import was under way: same fallback as the pre-check
+            success, notion_url = None, None
+            extra['notion_error'] = NOTION_UNAVAILABLE
+        
+        if success is False:
+            return jsonify({'success': False, 'error': f'Notion import failed: {notion_error}'})
+        
+        if success:
             return jsonify({
                 'success': True,
                 'template': selected_template,
-                'download_url': '/download'
+                'result_id': result_id,
+                'model': (result_store.get_data(result_id) or {}).get('model'),
+                'notion_url': notion_url,
+                **extra
             })
-            
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    
+    # Return download URL instead of sending file directly
+    return jsonify({
+        'success': True,
+        'template': selected_template,
+        'result_id': result_id,
+        'model': (result_store.get_data(result_id) or {}).get('model'),
+        'download_url': url_for('download_result', result_id=result_id, template=selected_template),
+        **extra
+    })
 
 @app.route('/download')
 def download():
@@ -451,5 +732,60 @@ def download():
     else:
         return "File not found", 404
 
+@app.route('/download/<result_id>/<template>')
+def download_result(result_id, template):
+    """Serve a rendered result with a content-hash ETag and pre-compressed bodies"""
+    artifact, error = result_store.get_artifact(result_id, template)
+    if error:
+        return error, 404
+    
+    headers = {
+        'ETag': artifact['etag'],
+        # A result ID + template always renders to the same bytes
+        'Cache-Control': 'private, max-age=86400, immutable',
+        'Vary': 'Accept-Encoding',
+    }
+    if parse_etags(request.headers.get('If-None-Match', '')) & {artifact['etag'], '*'}:
+        return Response(status=304, headers=headers)
+    
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), artifact)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    headers['Content-Disposition'] = 'attachment; filename=course-syllabus.md'
+    return Response(artifact[encoding], mimetype='text/markdown', headers=headers)
+
+def parse_etags(if_none_match):
+    """Split an If-None-Match header into its ETags (weak prefixes dropped)"""
+    if if_none_match.strip() == '*':
+        return {'*'}
+    etags = set()
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag:
+            etags.add(tag)
+    return etags
+
+def choose_encoding(accept_encoding, artifact):
+    """Pick br, then gzip, then identity, honouring q=0 in Accept-Encoding"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0 and artifact.get(encoding) is not None:
+            return encoding
+    return 'identity'
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,52 @@
+# backends.py - Lazy loaders for the heavy client SDKs (google-genai, httpx)
+#
+# Importing google.genai pulls in a large dependency tree, so the entry points
+# only load it when a code path actually talks to Gemini or Notion.
+import importlib
+import threading
+
+_lock = threading.Lock()
+_modules = {}
+
+
+def _load(module_name):
+    """Import a module once and cache it"""
+    module = _modules.get(module_name)
+    if module is None:
+        with _lock:
+            module = _modules.get(module_name)
+            if module is None:
+                module = importlib.import_module(module_name)
+                _modules[module_name] = module
+    return module
+
+
+def get_genai():
+    """Return (genai, types) from google-genai, importing on first use"""
+    genai = _load('google.genai')
+    types = _load('google.genai.types')
+    return genai, types
+
+
+def get_httpx():
+    """Return the httpx module (async-capable HTTP client), importing on first use"""
+    return _load('httpx')
+
+
+def get_pypdf():
+    """Return the pypdf module (optional, used for page fingerprints), or None if not installed"""
+    try:
+        return _load('pypdf')
+    except ImportError:
+        return None
+
+
+def warm_up():
+    """
+    Import every backend up front.
+
+    Call this from a pre-fork server hook (e.g. gunicorn's `on_starting` with
+    `preload_app`) so forked workers share the already-imported modules.
+    """
+    get_genai()
+    get_httpx()
@@ -0,0 +1,78 @@
+# batch_extract.py - Extract a whole term's syllabi, batching the short ones into shared model calls
+#
+# Usage: python batch_extract.py docs/*.pdf --out-dir data
+#        (writes <out-dir>/<name>-syllabus-info.json for each PDF; --no-batching sends one call per PDF)
+import argparse
+import asyncio
+import os
+import sys
+import time
+from batching import BATCH_MAX_DOCUMENTS, extract_batch, is_small, page_count
+from pdf_gemini_analysis import process_pdf_with_gemini_async
+from serialization import write_pretty_json
+
+
+async def extract_all(pdf_datas, batch_size, batching=True):
+    """
+    Extract every PDF; short ones go out batch_size at a time
+
+    Returns:
+        list: (extracted_data, error, output_file) per PDF, in input order
+    """
+    results = [None] * len(pdf_datas)
+    small, large = [], []
+    for index, pdf_data in enumerate(pdf_datas):
+        (small if batching and is_small(page_count(pdf_data)) else large).append(index)
+
+    async def run_batch(indices):
+        for index, result in zip(indices, await extract_batch([pdf_datas[i] for i in indices])):
+            results[index] = result
+
+    async def run_one(index):
+        results[index] = await process_pdf_with_gemini_async(pdf_datas[index], None)
+
+    # The admission controller keeps the total number of calls in flight within quota
+    await asyncio.gather(
+        *(run_batch(small[start:start + batch_size]) for start in range(0, len(small), batch_size)),
+        *(run_one(index) for index in large)
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract course info from many syllabus PDFs')
+    parser.add_argument('pdf_files', nargs='+', help='syllabus PDFs')
+    parser.add_argument('--out-dir', default='data', help='where to write the JSON files')
+    parser.add_argument('--batch-size', type=int, default=BATCH_MAX_DOCUMENTS,
+                        help='short syllabi per model call')
+    parser.add_argument('--no-batching', action='store_true', help='one model call per PDF')
+    args = parser.parse_args()
+
+    pdf_datas = []
+    for pdf_path in args.pdf_files:
+        with open(pdf_path, 'rb') as f:
+            pdf_datas.append(f.read())
+
+    print(f"Extracting {len(pdf_datas)} syllabi...")
+    start = time.monotonic()
+    results = asyncio.run(extract_all(pdf_datas, args.batch_size, batching=not args.no_batching))
+    elapsed = time.monotonic() - start
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    succeeded = 0
+    for pdf_path, (data, error, _) in zip(args.pdf_files, results):
+        if error:
+            print(f"  ✗ {pdf_path}: {error}")
+            continue
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        output_file = os.path.join(args.out_dir, f"{name}-syllabus-info.json")
+        write_pretty_json(data, output_file)
+        succeeded += 1
+        print(f"  ✓ {pdf_path}: {output_file}")
+    print(f"\n{succeeded}/{len(pdf_datas)} extracted in {elapsed:.1f}s "
+          f"({len(pdf_datas) * 60 / max(elapsed, 1e-9):.1f} documents/min)")
+    sys.exit(0 if succeeded == len(pdf_datas) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# batching.py - Extract several short syllabi with one model call
+#
+# For two- or three-page syllabi the fixed cost of a call (prompt, upload
+# round trips, model overhead) dominates. Small documents are collected for a
+# short window (or until the batch is full), uploaded together and sent in one
+# generate call whose answer is an array of course-info objects keyed by
+# document ID. Documents missing or invalid in that answer, or a batch that
+# fails outright, fall back to individual calls.
+import asyncio
+import concurrent.futures
+import io
+import os
+import threading
+import time
+from admission import AdmissionRejected, gemini_admission, is_overload_error
+from backends import get_genai, get_pypdf
+from circuit_breaker import CircuitOpenError, gemini_breaker, is_upstream_failure
+from model_cascade import validate_course_info
+from pdf_gemini_analysis import (PROMPT, generate_course_info, make_client, process_pdf_with_gemini_async,
+                                 save_extraction, upload_pdf)
+
+GEMINI_BATCHING = os.getenv('GEMINI_BATCHING', '0') == '1'
+BATCH_WINDOW_SECONDS = float(os.getenv('GEMINI_BATCH_WINDOW', '0.5'))
+BATCH_MAX_DOCUMENTS = int(os.getenv('GEMINI_BATCH_MAX_DOCUMENTS', '6'))
+BATCH_MAX_PAGES = int(os.getenv('GEMINI_BATCH_MAX_PAGES', '3'))  # only documents this short are batched
+BATCH_TOKENS_PER_DOCUMENT = 3000  # admission estimate for one short document in a batch
+
+BATCH_INSTRUCTIONS = """
+Several syllabus PDFs are attached, each one preceded by a line "Document ID: <id>".
+Extract each document separately and output a single JSON object of the form
+{"documents": [{"id": "<id>", "course-info": {...}}]}
+with exactly one entry per document, each course-info in the format above.
+"""
+
+
+def batch_prompt(prompt):
+    """Turn a single-document prompt into its batched version"""
+    return prompt + BATCH_INSTRUCTIONS
+
+
+def page_count(pdf_data):
+    """Number of pages, or None if pypdf isn't installed or the PDF can't be read"""
+    pypdf = get_pypdf()
+    if pypdf is None:
+        return None
+    try:
+        return len(pypdf.PdfReader(io.BytesIO(pdf_data)).pages)
+    except Exception:
+        return None
+
+
+def is_small(pages):
+    return pages is not None and pages <= BATCH_MAX_PAGES
+
+
+def validate_batch(doc_ids):
+    """
+    Validator for a batched answer: checks its structure only
+
+    Per-document problems don't escalate the whole batch to a bigger model;
+    split_batch keeps the usable documents and the rest get individual calls.
+    """
+    def validate(data):
+        documents = data.get('documents') if isinstance(data, dict) else None
+        if not isinstance(documents, list):
+            return ["missing 'documents' array"]
+        ids = {entry.get('id') for entry in documents if isinstance(entry, dict)}
+        if not ids.intersection(doc_ids):
+            return ["no entry matches a document ID"]
+        return []
+    return validate
+
+
+def split_batch(batch, doc_ids):
+    """Return {doc_id: course data} for the documents that came back usable"""
+    by_id = {entry.get('id'): entry for entry in batch.get('documents') or [] if isinstance(entry, dict)}
+    results = {}
+    for doc_id in doc_ids:
+        entry = by_id.get(doc_id)
+        if entry is None or validate_course_info(entry):
+            continue
+        data = {'course-info': entry['course-info']}
+        if batch.get('model'):
+            data['model'] = batch['model']
+        results[doc_id] = data
+    return results
+
+
+async def _extract_batch_once(pdf_datas, doc_ids, prompt):
+    """One admitted, breaker-guarded call for the whole batch; returns {doc_id: course data}"""
+    estimated_tokens = BATCH_TOKENS_PER_DOCUMENT * len(pdf_datas)
+    gemini_breaker.allow()
+    try:
+        await gemini_admission.acquire(estimated_tokens)
+    except AdmissionRejected:
+        gemini_breaker.abandon()
+        raise
+
+    call_info = {'tokens': None, 'overloaded': False, 'estimated_tokens': estimated_tokens}
+    start = time.monotonic()
+    upstream_failure = False
+    try:
+        genai, types = get_genai()
+        client = make_client(genai, types)
+        try:
+            pdf_files = await asyncio.gather(*(upload_pdf(client, pdf_data) for pdf_data in pdf_datas))
+            parts = []
+            for doc_id, pdf_file in zip(doc_ids, pdf_files):
+                parts += [f"Document ID: {doc_id}", pdf_file]
+            print(f"Analyzing {len(pdf_datas)} documents in one call...")
+            batch = await generate_course_info(client, types, parts, call_info, batch_prompt(prompt),
+                                               validate_batch(doc_ids))
+        finally:
+            await client.aio.aclose()
+        return split_batch(batch, doc_ids)
+    except Exception as e:
+        call_info['overloaded'] = is_overload_error(e)
+        upstream_failure = is_upstream_failure(e)
+        raise
+    finally:
+        gemini_admission.release(estimated_tokens, actual_tokens=call_info['tokens'],
+                                 overloaded=call_info['overloaded'])
+        gemini_breaker.record(success=not upstream_failure, duration=time.monotonic() - start)
+
+
+async def extract_batch(pdf_datas, prompt=PROMPT):
+    """
+    Extract several syllabi, batching them into one model call where possible
+
+    Args:
+        pdf_datas: List of binary PDFs (ideally short ones)
+        prompt: Single-document instruction text; batch instructions are appended
+
+    Returns:
+        list: (extracted_data, error, output_file) per document, in input order
+
+    Raises:
+        CircuitOpenError / AdmissionRejected: individual calls would be refused too
+    """
+    doc_ids = [f"doc{index + 1}" for index in range(len(pdf_datas))]
+    extracted = {}
+    if len(pdf_datas) > 1:
+        try:
+            extracted = await _extract_batch_once(pdf_datas, doc_ids, prompt)
+        except (CircuitOpenError, AdmissionRejected):
+            raise
+        except Exception as e:
+            print(f"Batched extraction failed ({e}), falling back to individual calls...")
+        # A lone document never goes out as a batch, so only count real batched calls
+        batch_stats.record(len(pdf_datas), len(pdf_datas) - len(extracted))
+
+    async def one(doc_id, pdf_data):
+        if doc_id in extracted:
+            return extracted[doc_id], None, save_extraction(extracted[doc_id])
+        return await process_pdf_with_gemini_async(pdf_data, None, prompt=prompt)
+
+    return list(await asyncio.gather(*(one(doc_id, pdf_data) for doc_id, pdf_data in zip(doc_ids, pdf_datas))))
+
+
+class BatchStats:
+    """How many documents went out in batches and how many needed an individual call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'documents': 0, 'fallbacks': 0}
+
+    def record(self, documents, fallbacks):
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['documents'] += documents
+            self.stats['fallbacks'] += fallbacks
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['mean_batch_size'] = stats['documents'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+class BatchCollector:
+    """
+    Server-side queue that groups small documents from concurrent requests (thread-safe)
+
+    Flask runs each async view on its own event loop, so batches are run on a
+    background thread and every request waits on a concurrent Future.
+    """
+
+    def __init__(self, enabled, window_seconds, max_documents):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._pending = {}  # prompt -> [(pdf_data, Future)]
+
+    def should_batch(self, pages):
+        return self.enabled and is_small(pages)
+
+    async def submit(self, pdf_data, prompt=PROMPT):
+        """Queue one document; returns (extracted_data, error, output_file) like process_pdf_with_gemini_async"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            pending = self._pending.setdefault(prompt, [])
+            pending.append((pdf_data, future))
+            if len(pending) >= self.max_documents:
+                del self._pending[prompt]
+                threading.Thread(target=self._run, args=(pending, prompt), daemon=True).start()
+            elif len(pending) == 1:
+                timer = threading.Timer(self.window_seconds, self._flush, args=(pending, prompt))
+                timer.daemon = True
+                timer.start()
+        return await asyncio.wrap_future(future)
+
+    def _flush(self, pending, prompt):
+        """Window elapsed: send whatever was collected, unless the batch already filled up"""
+        with self._lock:
+            if self._pending.get(prompt) is not pending:
+                return
+            del self._pending[prompt]
+        self._run(pending, prompt)
+
+    def _run(self, pending, prompt):
+        # Skip documents whose request gave up (e.g. hit its deadline) while queued
+        batch = [(pdf_data, future) for pdf_data, future in pending if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = asyncio.run(extract_batch([pdf_data for pdf_data, _ in batch], prompt))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+batch_stats = BatchStats()
+gemini_batcher = BatchCollector(GEMINI_BATCHING, BATCH_WINDOW_SECONDS, BATCH_MAX_DOCUMENTS)
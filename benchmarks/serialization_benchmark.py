@@ -0,0 +1,70 @@
+# serialization_benchmark.py - Encode/decode throughput and size for course records
+#
+# Usage: python benchmarks/serialization_benchmark.py [--records 2000] [--repeat 5]
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import serialization  # noqa: E402
+
+
+def load_corpus(records):
+    """Repeat the sample syllabi in data/ up to the requested number of records"""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, 'data', '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            samples.append(json.load(f))
+    return [samples[i % len(samples)] for i in range(records)]
+
+
+def codecs():
+    """name -> (encode, decode)"""
+    result = {
+        'json indent=4': (lambda obj: json.dumps(obj, indent=4).encode('utf-8'), json.loads),
+        'json compact': (lambda obj: json.dumps(obj, separators=(',', ':')).encode('utf-8'), json.loads),
+        'packed': (serialization.pack, serialization.unpack),
+        'packed (no zlib)': (lambda obj: serialization.pack(obj, compress=False), serialization.unpack),
+    }
+    if serialization.orjson is not None:
+        result['orjson'] = (serialization.orjson.dumps, serialization.orjson.loads)
+    return result
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serialization formats on syllabus data')
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    records = load_corpus(args.records)
+    print(f"{args.records} course records | orjson: {serialization.orjson is not None} | "
+          f"msgpack: {serialization.msgpack is not None}")
+    print(f"{'format':<20}{'bytes/rec':>10}{'enc rec/s':>12}{'dec rec/s':>12}{'enc MB/s':>10}{'dec MB/s':>10}")
+    for name, (encode, decode) in codecs().items():
+        encoded = [encode(record) for record in records]
+        size = sum(len(blob) for blob in encoded)
+        enc = best_time(lambda: [encode(record) for record in records], args.repeat)
+        dec = best_time(lambda: [decode(blob) for blob in encoded], args.repeat)
+        assert decode(encoded[0]) == records[0]
+        print(f"{name:<20}{size / len(records):>10.0f}{len(records) / enc:>12.0f}{len(records) / dec:>12.0f}"
+              f"{size / enc / 1e6:>10.1f}{size / dec / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# startup_benchmark.py - Measure cold import time per entry point and fail over budget
+#
+# Usage: python benchmarks/startup_benchmark.py [--runs N] [--budget module=ms ...]
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budget in milliseconds for each entry point
+BUDGETS_MS = {
+    'app': 400,
+    'main': 150,
+    'populate_template': 150,
+    'pdf_gemini_analysis': 150,
+    'notion_importer': 150,
+}
+
+# Modules that must NOT be loaded just by importing an entry point
+LAZY_MODULES = ['google.genai', 'httpx']
+
+
+def measure_import(module_name):
+    """Import a module in a fresh interpreter; return (elapsed_ms, leaked_modules, error)"""
+    check = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "elapsed = (time.perf_counter() - t) * 1000\n"
+        f"leaked = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+        "print(elapsed)\n"
+        "print('leaked=' + ','.join(leaked))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, '-c', check],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+        return None, [], last_line
+    lines = proc.stdout.strip().splitlines()
+    leaked = [m for m in lines[-1][len('leaked='):].split(',') if m]
+    return float(lines[-2]), leaked, None
+
+
+def top_imports(module_name, limit=5):
+    """Return the slowest imports (cumulative us, module) using -X importtime"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        parts = line.split('|')
+        try:
+            rows.append((int(parts[1].strip()), parts[2].strip()))
+        except (IndexError, ValueError):
+            continue
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Track import time per entry point')
+    parser.add_argument('--runs', type=int, default=5, help='runs per entry point (best is kept)')
+    parser.add_argument('--budget', action='append', default=[], help='override, e.g. app=300')
+    parser.add_argument('--verbose', action='store_true', help='show the slowest imports')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for override in args.budget:
+        name, _, ms = override.partition('=')
+        budgets[name] = float(ms)
+
+    failures = 0
+    print(f"{'entry point':<22}{'best ms':>10}{'budget':>10}  status")
+    for module_name, budget in budgets.items():
+        best, leaked, error = None, [], None
+        for _ in range(args.runs):
+            elapsed, leaked, error = measure_import(module_name)
+            if error:
+                break
+            best = elapsed if best is None else min(best, elapsed)
+
+        if error:
+            status = f'ERROR ({error})'
+            failures += 1
+        elif leaked:
+            status = f"FAIL (eagerly imported {', '.join(leaked)})"
+            failures += 1
+        elif best > budget:
+            status = 'FAIL (over budget)'
+            failures += 1
+        else:
+            status = 'ok'
+        best_text = f'{best:.1f}' if best is not None else '-'
+        print(f"{module_name:<22}{best_text:>10}{budget:>10.0f}  {status}")
+
+        if args.verbose and not error:
+            for cumulative_us, name in top_imports(module_name):
+                print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# bulk_import.py - Import a whole term's courses into Notion at once
+#
+# Usage: python bulk_import.py data/*.json --template modern --parent-title "2025W1 Courses"
+#        (reads the Notion token from NOTION_API_KEY, or pass --token)
+import argparse
+import os
+import sys
+from populate_template import render_markdown
+from serialization import load_artifact
+from notion_importer import import_courses_to_notion, course_page_title, BULK_IMPORT_CONCURRENCY
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import extracted syllabi into Notion')
+    parser.add_argument('json_files', nargs='+', help='course-info JSON files or packed .syb artifacts')
+    parser.add_argument('--template', default='modern', help='modern, classic or basic')
+    parser.add_argument('--parent-title', default='Courses', help='title of the page holding the courses')
+    parser.add_argument('--token', default=os.getenv('NOTION_API_KEY', ''), help='Notion integration token')
+    parser.add_argument('--concurrency', type=int, default=BULK_IMPORT_CONCURRENCY)
+    args = parser.parse_args()
+
+    if not args.token:
+        print("Error: no Notion token (set NOTION_API_KEY or pass --token)")
+        sys.exit(2)
+
+    template_path = f'notion_templates/notion_template_{args.template}.md'
+    if not os.path.exists(template_path):
+        print(f"Error: template not found: {template_path}")
+        sys.exit(2)
+
+    courses = []
+    for json_file in args.json_files:
+        data = load_artifact(json_file)
+        courses.append((course_page_title(data, default=os.path.basename(json_file)),
+                        render_markdown(data, template_path)))
+
+    print(f"Importing {len(courses)} courses under '{args.parent_title}'...")
+    summary = import_courses_to_notion(courses, args.token, args.parent_title, args.concurrency)
+
+    if summary.get('error'):
+        print(f"Error: {summary['error']}")
+        sys.exit(1)
+
+    for result in summary['results']:
+        if result['success']:
+            print(f"  ✓ {result['title']}: {result['url']}")
+        else:
+            print(f"  ✗ {result['title']}: {result['error']}")
+    created = sum(1 for result in summary['results'] if result['success'])
+    print(f"\n{created}/{len(courses)} pages created in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['pages_per_minute']:.1f} pages/min)")
+    print(f"Parent page: {summary['parent_url']}")
+    sys.exit(0 if created == len(courses) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# circuit_breaker.py - Circuit breakers so a dead Gemini or Notion fails fast instead of pinning workers
+#
+# closed:    calls go through; outcomes are tracked over a sliding window
+# open:      calls are refused immediately until open_seconds have passed
+# half_open: a few probe calls are let through; success closes, failure re-opens
+import os
+import threading
+import time
+from collections import deque
+from backends import get_httpx
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a breaker refuses a call; retry_after is in seconds"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} is unavailable right now, please retry shortly')
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error):
+    """
+    True if an error says the service itself is unhealthy: 5xx, 429, timeouts or network errors
+
+    Client-side problems (bad input, 4xx, output that fails validation) don't count,
+    so a few bad uploads can't open the breaker for everyone.
+    """
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    httpx = get_httpx()
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """Error-rate and slow-call-rate circuit breaker (thread-safe)"""
+
+    def __init__(self, name, failure_rate=0.5, slow_call_seconds=30.0, slow_call_rate=0.8,
+                 window_size=20, min_calls=5, open_seconds=30.0, half_open_probes=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window_size)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0}
+
+    def _retry_after(self):
+        return max(1, int(self._opened_at + self.open_seconds - time.monotonic() + 0.999))
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def is_open(self):
+        """True while calls would be refused (half-open with probe slots free counts as not open)"""
+        with self._lock:
+            state = self._current_state()
+            return state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes)
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be refused right now, without reserving a probe slot"""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes):
+                self.stats['rejected'] += 1
+                raise CircuitOpenError(self.name, self._retry_after() if state == OPEN else 1)
+
+    def allow(self):
+        """Reserve permission for one call, or raise CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return
+            self.stats['rejected'] += 1
+            raise CircuitOpenError(self.name, self._retry_after() if state == OPEN else 1)
+
+    def abandon(self):
+        """The permitted call never reached the backend (e.g. it was rejected locally)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record(self, success, duration):
+        """Record the outcome of a permitted call"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['failures'] += 0 if success else 1
+            self.stats['slow_calls'] += 1 if slow else 0
+
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip()
+                return
+
+            self._calls.append((not success, slow))
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                failed = sum(1 for f, _ in self._calls if f) / len(self._calls)
+                slowed = sum(1 for _, s in self._calls if s) / len(self._calls)
+                if failed >= self.failure_rate or slowed >= self.slow_call_rate:
+                    self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._calls.clear()
+        self.stats['opened'] += 1
+        print(f"Circuit breaker '{self.name}' opened")
+
+    def snapshot(self):
+        with self._lock:
+            state = self._current_state()
+            window = list(self._calls)
+            return dict(
+                self.stats,
+                state=state,
+                window_calls=len(window),
+                window_failure_rate=sum(1 for f, _ in window if f) / len(window) if window else 0.0,
+                window_slow_rate=sum(1 for _, s in window if s) / len(window) if window else 0.0,
+                retry_after=self._retry_after() if state == OPEN else 0,
+            )
+
+
+gemini_breaker = CircuitBreaker(
+    'Gemini',
+    failure_rate=float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', '0.5')),
+    slow_call_seconds=float(os.getenv('GEMINI_BREAKER_SLOW_SECONDS', '90')),
+    open_seconds=float(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', '30')),
+)
+
+notion_breaker = CircuitBreaker(
+    'Notion',
+    failure_rate=float(os.getenv('NOTION_BREAKER_FAILURE_RATE', '0.5')),
+    slow_call_seconds=float(os.getenv('NOTION_BREAKER_SLOW_SECONDS', '10')),
+    open_seconds=float(os.getenv('NOTION_BREAKER_OPEN_SECONDS', '30')),
+)
@@ -0,0 +1,65 @@
+# deadlines.py - End-to-end request deadlines with per-stage time budgets
+#
+# process() creates a Deadline; each pipeline stage runs with
+# min(stage budget, time left on the request) and is cancelled when it runs out.
+import asyncio
+import os
+import threading
+import time
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '150'))
+STAGE_BUDGETS = {
+    'extraction': float(os.getenv('EXTRACTION_BUDGET_SECONDS', '120')),
+    'render': float(os.getenv('RENDER_BUDGET_SECONDS', '5')),
+    'notion': float(os.getenv('NOTION_BUDGET_SECONDS', '30')),
+}
+
+# Bounds for calls that also run outside a request (CLI, bulk import, evaluation)
+FILE_PROCESSING_TIMEOUT_SECONDS = float(os.getenv('FILE_PROCESSING_TIMEOUT_SECONDS', '90'))
+NOTION_HTTP_TIMEOUT_SECONDS = float(os.getenv('NOTION_HTTP_TIMEOUT_SECONDS', '15'))
+
+_lock = threading.Lock()
+timeout_counts = {stage: 0 for stage in STAGE_BUDGETS}
+
+
+class StageTimeout(Exception):
+    """A pipeline stage ran out of time"""
+
+    def __init__(self, stage, budget):
+        super().__init__(f'Timed out during {stage} after {budget:.1f}s')
+        self.stage = stage
+        self.budget = budget
+
+
+class Deadline:
+    """Absolute deadline for one request"""
+
+    def __init__(self, seconds=REQUEST_DEADLINE_SECONDS):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, stage):
+        """Seconds this stage may use: its own budget, capped by what's left on the request"""
+        return min(STAGE_BUDGETS.get(stage, float('inf')), self.remaining())
+
+
+def record_timeout(stage):
+    with _lock:
+        timeout_counts[stage] = timeout_counts.get(stage, 0) + 1
+
+
+def timeout_snapshot():
+    with _lock:
+        return dict(timeout_counts)
+
+
+async def run_stage(deadline, stage, coro):
+    """Await coro within the stage's budget; cancel it and raise StageTimeout when time runs out"""
+    budget = deadline.budget(stage)
+    try:
+        return await asyncio.wait_for(coro, timeout=budget)
+    except asyncio.TimeoutError:
+        record_timeout(stage)
+        raise StageTimeout(stage, budget)
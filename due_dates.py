@@ -0,0 +1,148 @@
+# due_dates.py - Term-wide "what's due next" view across many courses
+#
+# Each course's homework and Important-dates are parsed and sorted once, when the
+# course is stored. A query over any set of courses jumps into each course's
+# list with a binary search and lazily k-way merges them with a heap, stopping
+# at the window end or the limit, so nothing is re-sorted per request.
+import bisect
+import heapq
+import itertools
+import threading
+from datetime import date, datetime, time, timedelta
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+
+
+def to_local_naive(when):
+    """Extracted dates have no timezone, so aware datetimes are compared in local time"""
+    return when.astimezone().replace(tzinfo=None) if when.tzinfo is not None else when
+
+
+def parse_when(value, time_of_day=None):
+    """
+    Parse an extracted date/datetime into a naive local datetime
+
+    Returns:
+        tuple: (datetime, all_day) or (None, False) if the value isn't a date
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None, False
+    value = value.strip()
+    try:
+        if len(value) <= 10:
+            day = date.fromisoformat(value)
+            if time_of_day:
+                try:
+                    return datetime.combine(day, time.fromisoformat(time_of_day.strip())), False
+                except (AttributeError, ValueError):
+                    pass
+            # No time given: keep it "upcoming" until the day is over
+            return datetime.combine(day, time.max), True
+        when = datetime.fromisoformat(value)
+    except ValueError:
+        return None, False
+    return to_local_naive(when), False
+
+
+def course_deadlines(result_id, data):
+    """Build one course's deadline entries, sorted by time"""
+    course_info = (data or {}).get('course-info') or {}
+    course = {'result_id': result_id, 'code': course_info.get('code'), 'title': course_info.get('title')}
+    entries = []
+    for item in course_info.get('homework') or []:
+        if not isinstance(item, dict):
+            continue
+        when, all_day = parse_when(item.get('due-date'))
+        if when is not None:
+            entries.append((when, {'kind': 'homework', 'name': item.get('name'), 'link': item.get('links')}, all_day))
+    for item in course_info.get('Important-dates') or []:
+        if not isinstance(item, dict):
+            continue
+        # Same fallbacks as populate_template: older extractions use 'day' and 'notes'
+        when, all_day = parse_when(item.get('date') or item.get('day'), item.get('start_time'))
+        if when is not None:
+            entries.append((when, {'kind': 'important-date', 'name': item.get('name'),
+                                   'location': item.get('location') or item.get('notes')}, all_day))
+    # Stable sort keeps extraction order for items due at the same moment
+    entries.sort(key=lambda entry: entry[0])
+    return [
+        dict(details, when=when.isoformat(timespec='minutes'), all_day=all_day, **course)
+        for when, details, all_day in entries
+    ], [when for when, _, _ in entries]
+
+
+class DueDateIndex:
+    """Per-course sorted deadlines with merged queries (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._courses = {}  # result_id -> (sorted datetimes, matching entries)
+        self._aliases = {}  # superseded result_id -> the result_id that replaced it
+
+    def update(self, result_id, data, replaces=None):
+        """(Re)index one course; replaces drops the version it was revised from"""
+        entries, times = course_deadlines(result_id, data)
+        with self._lock:
+            self._courses[result_id] = (times, entries)
+            if replaces and replaces != result_id:
+                self._courses.pop(replaces, None)
+                self._aliases[replaces] = result_id
+
+    def remove(self, result_id):
+        with self._lock:
+            self._courses.pop(result_id, None)
+            for old in [old for old, new in self._aliases.items() if old == result_id or new == result_id]:
+                del self._aliases[old]
+
+    def _resolve(self, result_id):
+        seen = set()
+        while result_id in self._aliases and result_id not in seen:
+            seen.add(result_id)
+            result_id = self._aliases[result_id]
+        return result_id
+
+    def upcoming(self, result_ids=None, start=None, end=None, limit=DEFAULT_LIMIT):
+        """
+        Next deadlines across courses in time order
+
+        Args:
+            result_ids: Courses to include (None = every indexed course)
+            start: Earliest time to include (default now)
+            end: Optional cut-off; nothing at or after it is returned
+            limit: Maximum number of entries
+
+        Returns:
+            list: Entries with when, all_day, kind, name, code, title, result_id
+        """
+        start = to_local_naive(start) if start else datetime.now()
+        end = to_local_naive(end) if end else None
+        with self._lock:
+            if result_ids is None:
+                courses = list(self._courses.values())
+            else:
+                wanted = dict.fromkeys(self._resolve(result_id) for result_id in result_ids)
+                courses = [self._courses[result_id] for result_id in wanted if result_id in self._courses]
+
+        def from_start(times, entries):
+            # Lists are never mutated after indexing (updates swap in new ones), so no lock needed here
+            for index in range(bisect.bisect_left(times, start), len(times)):
+                if end is not None and times[index] >= end:
+                    return
+                yield times[index], entries[index]
+
+        merged = heapq.merge(*(from_start(times, entries) for times, entries in courses), key=lambda pair: pair[0])
+        return [entry for _, entry in itertools.islice(merged, max(0, min(limit, MAX_LIMIT)))]
+
+    def snapshot(self):
+        with self._lock:
+            return {'courses': len(self._courses),
+                    'deadlines': sum(len(times) for times, _ in self._courses.values())}
+
+
+due_date_index = DueDateIndex()
+
+
+def window_end(start, days):
+    """End of a window of the given number of days, or None for no cut-off"""
+    return start + timedelta(days=days) if days else None
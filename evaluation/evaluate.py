@@ -0,0 +1,265 @@
+# evaluate.py - Accuracy vs latency evaluation of prompts and models against golden course-info JSON
+#
+# Usage:
+#   python evaluation/evaluate.py --config gemini-flash-latest --record      (live, saves responses)
+#   python evaluation/evaluate.py --config gemini-flash-latest --replay      (offline, reproducible)
+#   python evaluation/evaluate.py --config lite=gemini-flash-lite-latest:prompts/short.txt --config gemini-flash-latest
+#
+# A config is "[name=]model[:prompt_file]". Without a prompt file the current
+# pdf_gemini_analysis.PROMPT is used.
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from pdf_gemini_analysis import PROMPT, API_KEY, make_client, upload_pdf  # noqa: E402
+from backends import get_genai  # noqa: E402
+
+EVAL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(EVAL_DIR, 'corpus.json')
+RECORDINGS_DIR = os.path.join(EVAL_DIR, 'recordings')
+
+# Report section -> course-info key (None = the top-level scalar fields)
+SECTIONS = {
+    'course': None,
+    'meetings': 'meetings',
+    'homework': 'homework',
+    'dates': 'Important-dates',
+    'contacts': 'contacts',
+    'resources': 'resources',
+}
+COURSE_FIELDS = ['code', 'title', 'location']
+
+
+def parse_config(text):
+    """'[name=]model[:prompt_file]' -> {'name', 'model', 'prompt', 'prompt_hash'}"""
+    name, _, spec = text.rpartition('=')
+    model, _, prompt_file = spec.partition(':')
+    prompt = PROMPT
+    if prompt_file:
+        with open(prompt_file, 'r', encoding='utf-8') as f:
+            prompt = f.read()
+    if not name:
+        name = model if not prompt_file else f"{model}-{os.path.splitext(os.path.basename(prompt_file))[0]}"
+    return {
+        'name': name,
+        'model': model,
+        'prompt': prompt,
+        'prompt_hash': hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12],
+    }
+
+
+def normalize(value):
+    """Canonical form for comparing field values (case, URL scheme, ISO date spelling)"""
+    if value is None:
+        return ''
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).replace(tzinfo=None).isoformat()
+    except ValueError:
+        pass
+    text = text.lower()
+    for prefix in ('https://', 'http://', 'www.'):
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    return text.rstrip('/')
+
+
+def field_facts(data, section_key):
+    """Multiset of (field, value) facts for one section, ignoring empty values"""
+    course_info = (data or {}).get('course-info') or {}
+    facts = Counter()
+    if section_key is None:
+        for field in COURSE_FIELDS:
+            value = normalize(course_info.get(field))
+            if value:
+                facts[(field, value)] += 1
+        return facts
+    for item in course_info.get(section_key) or []:
+        if not isinstance(item, dict):
+            continue
+        for field, value in item.items():
+            value = normalize(value)
+            if value:
+                facts[(field, value)] += 1
+    return facts
+
+
+def score(predicted, golden):
+    """Field-level precision/recall per section"""
+    scores = {}
+    for section, key in SECTIONS.items():
+        pred, gold = field_facts(predicted, key), field_facts(golden, key)
+        matched = sum((pred & gold).values())
+        scores[section] = {
+            'matched': matched,
+            'predicted': sum(pred.values()),
+            'golden': sum(gold.values()),
+        }
+    return scores
+
+
+def recording_path(config, doc_id):
+    return os.path.join(RECORDINGS_DIR, config['name'], f'{doc_id}.json')
+
+
+def run_live(config, pdf_path):
+    """Upload, poll and generate once; return a recording dict"""
+    with open(pdf_path, 'rb') as f:
+        pdf_data = f.read()
+    return asyncio.run(_run_live(config, pdf_data))
+
+
+async def _run_live(config, pdf_data):
+    genai, types = get_genai()
+    client = make_client(genai, types)
+    try:
+        # Same upload and bounded polling as the server
+        pdf_file = await upload_pdf(client, pdf_data)
+        start = time.monotonic()
+        response = await client.aio.models.generate_content(
+            model=config['model'],
+            contents=[config['prompt'], pdf_file],
+            config=types.GenerateContentConfig(response_mime_type="application/json")
+        )
+        latency = time.monotonic() - start
+    finally:
+        await client.aio.aclose()
+    usage = getattr(response, 'usage_metadata', None)
+    return {
+        'model': config['model'],
+        'prompt_hash': config['prompt_hash'],
+        'text': response.text,
+        'latency_seconds': latency,
+        'input_tokens': getattr(usage, 'prompt_token_count', None),
+        'output_tokens': getattr(usage, 'candidates_token_count', None),
+    }
+
+
+def load_recording(config, doc_id):
+    path = recording_path(config, doc_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No recording at {path} (run with --record first)")
+    with open(path, 'r', encoding='utf-8') as f:
+        recording = json.load(f)
+    if recording.get('prompt_hash') != config['prompt_hash']:
+        print(f"  warning: {path} was recorded with a different prompt")
+    return recording
+
+
+def save_recording(config, doc_id, recording):
+    path = recording_path(config, doc_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(recording, f, indent=4)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def evaluate(config, documents, mode):
+    """Run one configuration over the corpus; return aggregate results"""
+    totals = {section: Counter() for section in SECTIONS}
+    latencies, input_tokens, output_tokens, failures = [], [], [], 0
+    for doc in documents:
+        with open(os.path.join(REPO_ROOT, doc['golden']), 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+        try:
+            if mode == 'replay':
+                recording = load_recording(config, doc['id'])
+            else:
+                recording = run_live(config, os.path.join(REPO_ROOT, doc['pdf']))
+                if mode == 'record':
+                    save_recording(config, doc['id'], recording)
+            predicted = json.loads(recording['text'])
+        except Exception as e:
+            print(f"  {config['name']} / {doc['id']}: {e}")
+            failures += 1
+            predicted, recording = {}, None
+
+        for section, counts in score(predicted, golden).items():
+            totals[section].update(counts)
+        if recording:
+            latencies.append(recording['latency_seconds'])
+            input_tokens.append(recording.get('input_tokens') or 0)
+            output_tokens.append(recording.get('output_tokens') or 0)
+
+    sections = {}
+    for section, counts in totals.items():
+        precision = counts['matched'] / counts['predicted'] if counts['predicted'] else 0.0
+        recall = counts['matched'] / counts['golden'] if counts['golden'] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        sections[section] = {'precision': precision, 'recall': recall, 'f1': f1}
+    count = len(latencies) or 1
+    return {
+        'config': config['name'],
+        'model': config['model'],
+        'prompt_hash': config['prompt_hash'],
+        'documents': len(documents),
+        'failures': failures,
+        'sections': sections,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p95': percentile(latencies, 95),
+        'mean_input_tokens': sum(input_tokens) / count,
+        'mean_output_tokens': sum(output_tokens) / count,
+    }
+
+
+def print_report(results):
+    header = f"{'config':<28}" + ''.join(f"{section:>16}" for section in SECTIONS)
+    print('\nField-level precision / recall')
+    print(header)
+    for result in results:
+        row = f"{result['config']:<28}"
+        for section in SECTIONS:
+            s = result['sections'][section]
+            row += f"{s['precision']:>8.2f}/{s['recall']:<7.2f}"
+        print(row)
+    print('\nLatency and tokens')
+    print(f"{'config':<28}{'p50 s':>8}{'p95 s':>8}{'in tok':>10}{'out tok':>10}{'failed':>8}")
+    for result in results:
+        print(f"{result['config']:<28}{result['latency_p50']:>8.2f}{result['latency_p95']:>8.2f}"
+              f"{result['mean_input_tokens']:>10.0f}{result['mean_output_tokens']:>10.0f}"
+              f"{result['failures']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate extraction quality, latency and tokens')
+    parser.add_argument('--config', action='append', required=True, help='[name=]model[:prompt_file]')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', action='store_true', help='call the model and save responses')
+    mode.add_argument('--replay', action='store_true', help='use saved responses only (no network)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if not args.replay and not API_KEY:
+        print("Error: set GEMINI_API_KEY (or use --replay)")
+        sys.exit(2)
+
+    with open(args.corpus, 'r', encoding='utf-8') as f:
+        documents = json.load(f)['documents']
+
+    run_mode = 'replay' if args.replay else 'record' if args.record else 'live'
+    results = [evaluate(parse_config(text), documents, run_mode) for text in args.config]
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# hedging.py - Hedged model requests to cut tail latency
+#
+# If a call is still running after the configured percentile of recently
+# observed latencies, a duplicate is started. The first valid result wins
+# and the other call is cancelled. Hedges are capped as a fraction of calls.
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+GEMINI_HEDGING = os.getenv('GEMINI_HEDGING', '0') == '1'
+GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', '95'))
+GEMINI_HEDGE_MAX_FRACTION = float(os.getenv('GEMINI_HEDGE_MAX_FRACTION', '0.05'))
+
+LATENCY_WINDOW = 200  # most recent call latencies kept
+MIN_SAMPLES = 20      # don't hedge until the percentile means something
+
+
+class HedgePolicy:
+    """Latency tracking, hedge budget and hedge metrics (thread-safe)"""
+
+    def __init__(self, enabled, percentile, max_fraction, window=LATENCY_WINDOW, min_samples=MIN_SAMPLES):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None if there isn't enough history"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return ordered[index]
+
+    def _take_hedge_budget(self):
+        with self._lock:
+            if self.stats['hedges'] + 1 > self.stats['calls'] * self.max_fraction:
+                return False
+            self.stats['hedges'] += 1
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            calls, hedges, wins = self.stats['calls'], self.stats['hedges'], self.stats['hedge_wins']
+        return {
+            'enabled': self.enabled,
+            'calls': calls,
+            'hedges': hedges,
+            'hedge_wins': wins,
+            'hedge_rate': hedges / calls if calls else 0.0,
+            'win_rate': wins / hedges if hedges else 0.0,
+            'hedge_delay_seconds': self.hedge_delay(),
+        }
+
+    async def _timed(self, make_call):
+        start = time.monotonic()
+        result = await make_call()
+        self.record_latency(time.monotonic() - start)
+        return result
+
+    async def run(self, make_call, is_valid, can_hedge=None, on_hedge_done=None):
+        """
+        Run make_call() (a coroutine factory), hedging it if it is slow
+
+        Args:
+            make_call: Zero-argument function returning a new coroutine for the call
+            is_valid: Function(result) -> bool; invalid results don't win
+            can_hedge: Optional zero-argument function -> bool (e.g. quota check)
+            on_hedge_done: Optional function(result, error) run once a started hedge has
+                finished, with the hedge's response or exception (both None if it was cancelled)
+
+        Returns:
+            The first valid result (or the primary's result if neither is valid)
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+
+        primary = asyncio.ensure_future(self._timed(make_call))
+        delay = self.hedge_delay() if self.enabled else None
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            # asyncio.wait doesn't cancel what it waits on
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+        if not self._take_hedge_budget():
+            return await primary
+        if can_hedge is not None and not can_hedge():
+            with self._lock:
+                self.stats['hedges'] -= 1
+            return await primary
+
+        print("Generation is slow, sending a hedged request...")
+        hedge = asyncio.ensure_future(self._timed(make_call))
+        pending = {primary, hedge}
+        fallback = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    result = task.result()
+                    if is_valid(result):
+                        if task is hedge:
+                            with self._lock:
+                                self.stats['hedge_wins'] += 1
+                        return result
+                    if task is primary:
+                        fallback = task
+            # Neither gave a valid result: behave like the unhedged call would have
+            return primary.result() if fallback is None else fallback.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if on_hedge_done is not None:
+                if hedge.done() and not hedge.cancelled():
+                    error = hedge.exception()
+                    on_hedge_done(None if error else hedge.result(), error)
+                else:
+                    on_hedge_done(None, None)
+
+
+gemini_hedging = HedgePolicy(GEMINI_HEDGING, GEMINI_HEDGE_PERCENTILE, GEMINI_HEDGE_MAX_FRACTION)
@@ -0,0 +1,223 @@
+# incremental.py - Page-hash incremental re-extraction for revised syllabi
+#
+# Each processed PDF keeps a fingerprint per page (hash of its normalized text)
+# and the page each extracted item came from. When a new version arrives, only
+# pages whose fingerprint is new are sent to the model; items from unchanged
+# pages are carried over and items from removed or changed pages are retired.
+import asyncio
+import hashlib
+import io
+import re
+from admission import gemini_admission
+from backends import get_pypdf
+from circuit_breaker import gemini_breaker
+from batching import gemini_batcher
+from pdf_gemini_analysis import PROMPT, process_pdf_with_gemini_async, save_extraction
+
+ITEM_SECTIONS = ['resources', 'contacts', 'homework', 'meetings', 'Important-dates']
+SCALAR_FIELDS = ['code', 'title', 'location']
+
+# Re-extract the whole document when more than this fraction of pages changed
+FULL_REEXTRACT_FRACTION = 0.6
+
+PAGE_PROMPT = PROMPT + """
+For every object in resources, contacts, homework, meetings and Important-dates,
+add a "page" field with the 1-based page number of the attached PDF it came from.
+"""
+
+PARTIAL_PROMPT = PAGE_PROMPT + """
+The attached PDF holds only some pages of the syllabus. Extract what those pages
+contain and leave everything else null or empty.
+"""
+
+
+def normalize_page_text(text):
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+
+def page_fingerprints(pdf_data):
+    """Hash of each page's normalized text, or None if pypdf isn't installed or can't read the PDF"""
+    pypdf = get_pypdf()
+    if pypdf is None:
+        return None
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_data))
+        return [
+            hashlib.sha256(normalize_page_text(page.extract_text()).encode('utf-8')).hexdigest()
+            for page in reader.pages
+        ]
+    except Exception as e:
+        # Gemini may still make sense of it; just skip page tracking
+        print(f"Could not read page text ({e}), extracting the whole document")
+        return None
+
+
+def extract_pages(pdf_data, page_indices):
+    """Build a new PDF containing only the given (0-based) pages"""
+    pypdf = get_pypdf()
+    reader = pypdf.PdfReader(io.BytesIO(pdf_data))
+    writer = pypdf.PdfWriter()
+    for index in page_indices:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def only_course_info(data):
+    """Validator for partial extractions: structure only, nothing is required"""
+    if isinstance(data, dict) and isinstance(data.get('course-info'), dict):
+        return []
+    return ["missing 'course-info' object"]
+
+
+def split_item_pages(data, page_map, default_page=None):
+    """
+    Strip the model's "page" fields from items and return {section: [page index or None]}
+
+    Args:
+        page_map: Translates the model's 1-based page number to a page index in the full document
+        default_page: Page index for items the model left untagged (e.g. the only page sent)
+    """
+    course_info = data.get('course-info') or {}
+    item_pages = {}
+    for section in ITEM_SECTIONS:
+        pages = []
+        for item in course_info.get(section) or []:
+            page = item.pop('page', None) if isinstance(item, dict) else None
+            try:
+                number = int(page)
+            except (TypeError, ValueError):
+                number = 0
+            # Page numbers are 1-based; 0 or negative would wrap around the list
+            pages.append(page_map[number - 1] if 1 <= number <= len(page_map) else default_page)
+        item_pages[section] = pages
+    return item_pages
+
+
+def has_untagged(item_pages):
+    """True if any item's page is unknown, so it can't be carried over or retired reliably"""
+    return any(page is None for pages in item_pages.values() for page in pages)
+
+
+def diff_pages(old_hashes, new_hashes):
+    """
+    Match pages by fingerprint
+
+    Returns:
+        tuple: ({old index: new index} for unchanged pages, [new indices that changed])
+    """
+    unused_old = {}
+    for index, page_hash in enumerate(old_hashes):
+        unused_old.setdefault(page_hash, []).append(index)
+    moved, changed = {}, []
+    for new_index, page_hash in enumerate(new_hashes):
+        if unused_old.get(page_hash):
+            moved[unused_old[page_hash].pop(0)] = new_index
+        else:
+            changed.append(new_index)
+    return moved, changed
+
+
+def merge_revision(previous_data, previous_pages, moved, partial_data, partial_pages):
+    """Carry over items from unchanged pages, add items from changed pages, order by page"""
+    old_info = previous_data.get('course-info') or {}
+    new_info = partial_data.get('course-info') or {}
+    merged_info = dict(old_info)
+    merged_pages = {}
+
+    for field in SCALAR_FIELDS:
+        if new_info.get(field):
+            merged_info[field] = new_info[field]
+
+    for section in ITEM_SECTIONS:
+        entries = []
+        old_items = old_info.get(section) or []
+        old_item_pages = previous_pages.get(section) or [None] * len(old_items)
+        for item, page in zip(old_items, old_item_pages):
+            if page in moved:
+                entries.append((moved[page], item))
+            # else: its page was changed or removed, so the item is retired
+        for item, page in zip(new_info.get(section) or [], partial_pages.get(section) or []):
+            entries.append((page, item))
+
+        # Stable sort keeps extraction order within a page
+        entries.sort(key=lambda entry: entry[0])
+        merged_info[section] = [item for _, item in entries]
+        merged_pages[section] = [page for page, _ in entries]
+
+    merged = dict(previous_data, **{'course-info': merged_info})
+    if partial_data.get('model'):
+        merged['model'] = partial_data['model']
+    return merged, merged_pages
+
+
+async def extract_with_page_tracking(pdf_data, selected_template, previous=None):
+    """
+    Extract a syllabus, re-using a previous version's results where pages are unchanged
+
+    Args:
+        pdf_data: Binary PDF data
+        selected_template: Template name (passed through)
+        previous: Optional {'data': ..., 'page_state': ...} from an earlier version
+
+    Returns:
+        tuple: (extracted_data, error, output_file, page_state) where page_state is
+               {'hashes': [...], 'item_pages': {section: [...]}, 'changed_pages': [...]}
+               or None when page fingerprints aren't available
+    
+    Raises:
+        CircuitOpenError / AdmissionRejected: checked before the PDF is parsed
+    """
+    # Fail fast before paying for the PDF parse when Gemini would refuse the call anyway
+    gemini_breaker.check()
+    gemini_admission.check()
+    
+    # pypdf parsing is CPU-bound: run it off the event loop so other requests and deadlines keep ticking
+    hashes = await asyncio.to_thread(page_fingerprints, pdf_data)
+    if hashes is None:
+        data, error, output_file = await process_pdf_with_gemini_async(pdf_data, selected_template)
+        return data, error, output_file, None
+
+    previous_state = (previous or {}).get('page_state')
+    if previous_state and has_untagged(previous_state['item_pages']):
+        # Items without a page would be carried into every later version: start afresh
+        print("Previous version has items without page numbers, extracting the whole document")
+    elif previous_state:
+        moved, changed = diff_pages(previous_state['hashes'], hashes)
+        if len(changed) <= FULL_REEXTRACT_FRACTION * len(hashes):
+            print(f"Revision: {len(changed)} of {len(hashes)} pages changed")
+            partial, partial_pages = {}, {}
+            if changed:
+                partial_pdf = await asyncio.to_thread(extract_pages, pdf_data, changed)
+                partial, error, _ = await process_pdf_with_gemini_async(
+                    partial_pdf, selected_template, prompt=PARTIAL_PROMPT, validator=only_course_info
+                )
+                if error:
+                    return None, error, None, None
+                # With a single page sent, an untagged item can only have come from that page
+                partial_pages = split_item_pages(partial, changed, changed[0] if len(changed) == 1 else None)
+            if has_untagged(partial_pages):
+                print("Some changed items have no page number, extracting the whole document")
+            else:
+                data, item_pages = merge_revision(
+                    previous['data'], previous_state['item_pages'], moved, partial, partial_pages
+                )
+                output_file = save_extraction(data)
+                return data, None, output_file, {'hashes': hashes, 'item_pages': item_pages,
+                                                 'changed_pages': changed}
+
+    if gemini_batcher.should_batch(len(hashes)):
+        # Short syllabus: share one model call with other small uploads
+        data, error, output_file = await gemini_batcher.submit(pdf_data, PAGE_PROMPT)
+    else:
+        data, error, output_file = await process_pdf_with_gemini_async(
+            pdf_data, selected_template, prompt=PAGE_PROMPT
+        )
+    if error:
+        return None, error, None, None
+    item_pages = split_item_pages(data, list(range(len(hashes))))
+    output_file = save_extraction(data)
+    return data, None, output_file, {
+        'hashes': hashes, 'item_pages': item_pages, 'changed_pages': list(range(len(hashes)))
+    }
@@ -0,0 +1,127 @@
+# load_generator.py - Drive /process at a target request rate and report latency percentiles
+#
+# Usage: python loadtest/load_generator.py --url http://127.0.0.1:5000 --rate 5 --duration 60
+#        (start loadtest/stub_servers.py and point the app at it first)
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PDF = os.path.join(REPO_ROOT, 'docs', 'cpsc330-2025W1_README.pdf')
+
+
+def build_multipart(fields, file_field, filename, file_bytes):
+    """Encode form fields and one file as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode('utf-8')
+    )
+    parts.append(file_bytes)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def send_one(url, body, content_type, timeout, scheduled=None):
+    """
+    POST one request; return (latency_seconds, outcome)
+
+    Latency counts from scheduled (when the request was due to be sent) if given, so
+    time spent waiting for a free worker isn't left out (coordinated omission).
+    """
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type}, method='POST')
+    start = time.monotonic() if scheduled is None else scheduled
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read() or b'{}')
+        outcome = 'ok' if payload.get('success') else 'app_error: ' + str(payload.get('error', ''))[:60]
+    except urllib.error.HTTPError as e:
+        outcome = f'http_{e.code}'
+    except Exception as e:
+        outcome = type(e).__name__
+    return time.monotonic() - start, outcome
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, rate, duration, body, content_type, timeout, max_workers):
+    """Open-loop load: start requests on a fixed schedule regardless of completions"""
+    results = []
+    lock = threading.Lock()
+
+    def task(scheduled):
+        result = send_one(url, body, content_type, timeout, scheduled)
+        with lock:
+            results.append(result)
+
+    total = int(rate * duration)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, scheduled)
+    return results, time.monotonic() - start
+
+
+def report(results, elapsed):
+    latencies = sorted(latency for latency, outcome in results if outcome == 'ok')
+    outcomes = Counter(outcome for _, outcome in results)
+    print(f"\nRequests: {len(results)} in {elapsed:.1f}s")
+    print(f"Throughput (ok): {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        print(f"Latency ok  p50 {percentile(latencies, 50) * 1000:.0f} ms  "
+              f"p95 {percentile(latencies, 95) * 1000:.0f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:.0f} ms  "
+              f"max {latencies[-1] * 1000:.0f} ms")
+    print("Outcomes:")
+    for outcome, count in outcomes.most_common():
+        print(f"  {count:6d}  {outcome}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the /process endpoint')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of the app')
+    parser.add_argument('--rate', type=float, default=2.0, help='requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to generate load')
+    parser.add_argument('--pdf', default=DEFAULT_PDF)
+    parser.add_argument('--template', default='modern')
+    parser.add_argument('--notion-api-key', default='', help='set to exercise the Notion stand-in too')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--max-workers', type=int, default=256)
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        pdf_bytes = f.read()
+    fields = {'template': args.template}
+    if args.notion_api_key:
+        fields['notion_api_key'] = args.notion_api_key
+    body, content_type = build_multipart(fields, 'pdf_file', os.path.basename(args.pdf), pdf_bytes)
+
+    print(f"Sending {args.rate} req/s to {args.url}/process for {args.duration}s...")
+    results, elapsed = run_load(args.url.rstrip('/') + '/process', args.rate, args.duration,
+                                body, content_type, args.timeout, args.max_workers)
+    report(results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
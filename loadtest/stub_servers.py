@@ -0,0 +1,326 @@
+# stub_servers.py - Local stand-ins for the Gemini and Notion APIs, for offline load tests
+#
+# Usage: python loadtest/stub_servers.py --gemini-port 8801 --notion-port 8802 \
+#            --latency-ms 800 --latency-sigma 0.5 --error-rate 0.01 --quota-rpm 600
+# Then start the app with:
+#   GEMINI_API_KEY=stub GEMINI_BASE_URL=http://127.0.0.1:8801 \
+#   NOTION_API_BASE=http://127.0.0.1:8802 python app.py
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESPONSE_FILE = os.path.join(REPO_ROOT, 'data', 'cpsc330-syllabus-info.json')
+
+
+class StubBehaviour:
+    """Latency, failure and quota settings shared by a stand-in server"""
+
+    def __init__(self, latency_ms, latency_sigma, error_rate, quota_rpm, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.quota_rpm = quota_rpm
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = []  # request timestamps in the last minute
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0}
+
+    def sample_latency(self):
+        """Lognormal latency with the configured median (ms -> s)"""
+        with self._lock:
+            factor = math.exp(self._random.gauss(0, self.latency_sigma)) if self.latency_sigma else 1.0
+        return self.latency_ms * factor / 1000
+
+    def admit(self):
+        """Return 'ok', 'rate_limited' or 'error' for the next request"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.quota_rpm:
+                self._window = [t for t in self._window if now - t < 60]
+                if len(self._window) >= self.quota_rpm:
+                    self.stats['rate_limited'] += 1
+                    return 'rate_limited'
+                self._window.append(now)
+            if self._random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+        return 'ok'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    behaviour = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # keep load-test output readable
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate(self, latency=True, behaviour=None):
+        """Apply quota/error/latency; return False if an error response was sent"""
+        behaviour = behaviour or self.behaviour
+        outcome = behaviour.admit()
+        if outcome == 'rate_limited':
+            self.send_json(429, {'error': {'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}},
+                           {'Retry-After': '1'})
+            return False
+        if latency:
+            time.sleep(behaviour.sample_latency())
+        if outcome == 'error':
+            self.send_json(503, {'error': {'code': 503, 'message': 'Overloaded', 'status': 'UNAVAILABLE'}})
+            return False
+        return True
+
+
+class GeminiStubHandler(StubHandler):
+    """Mimics files.upload (resumable), files.get, cachedContents and models.generateContent"""
+    files_behaviour = None  # latency/errors/quota for files.upload and files.get
+    files = {}
+    files_lock = threading.Lock()
+    caches = {}  # name -> {'tokens', 'model', 'expires_at' (monotonic), 'expires_wall' (epoch)}
+    processing_seconds = 0.0
+    response_text = '{}'
+    cache_min_tokens = 0  # reject cache creation below this many tokens, like the real API
+    pdf_tokens = 1800
+
+    def parse_ttl(self, payload):
+        return float(str(payload.get('ttl', '3600s')).rstrip('s'))
+
+    def cache_resource(self, name):
+        cache = self.caches[name]
+        return {
+            'name': name,
+            'model': cache['model'],
+            'expireTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(cache['expires_wall'])),
+            'usageMetadata': {'totalTokenCount': cache['tokens']},
+        }
+
+    def do_PATCH(self):
+        path = self.path.split('?')[0]
+        payload = json.loads(self.read_body() or b'{}')
+        name = path.split('/v1beta/', 1)[-1]
+        with self.files_lock:
+            cache = self.caches.get(name)
+            if cache is not None and cache['expires_at'] > time.monotonic():
+                ttl = self.parse_ttl(payload)
+                cache['expires_at'] = time.monotonic() + ttl
+                cache['expires_wall'] = time.time() + ttl
+                self.send_json(200, self.cache_resource(name))
+                return
+        self.send_json(404, {'error': {'code': 404, 'message': f'Unknown cache {name}', 'status': 'NOT_FOUND'}})
+
+    def file_resource(self, name):
+        with self.files_lock:
+            created = self.files[name]
+        state = 'PROCESSING' if time.monotonic() - created < self.processing_seconds else 'ACTIVE'
+        return {
+            'name': name,
+            'mimeType': 'application/pdf',
+            'uri': f'http://{self.headers.get("Host")}/v1beta/{name}',
+            'state': state,
+        }
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        body = self.read_body()
+        if path.endswith('/cachedContents'):
+            payload = json.loads(body or b'{}')
+            tokens = len(json.dumps(payload.get('contents', []))) // 4
+            if tokens < self.cache_min_tokens:
+                self.send_json(400, {'error': {
+                    'code': 400, 'status': 'INVALID_ARGUMENT',
+                    'message': f'Cached content is too small. total_token_count={tokens}, min_total_token_count={self.cache_min_tokens}',
+                }})
+                return
+            name = f'cachedContents/{uuid.uuid4().hex[:12]}'
+            ttl = self.parse_ttl(payload)
+            with self.files_lock:
+                self.caches[name] = {'tokens': tokens, 'model': payload.get('model', ''),
+                                     'expires_at': time.monotonic() + ttl, 'expires_wall': time.time() + ttl}
+                resource = self.cache_resource(name)
+            self.send_json(200, resource)
+            return
+        if path.startswith('/upload/'):
+            command = self.headers.get('X-Goog-Upload-Command', '')
+            if 'start' in command:
+                upload_id = uuid.uuid4().hex
+                self.send_json(200, {}, {
+                    'X-Goog-Upload-URL': f'http://{self.headers.get("Host")}/upload/v1beta/files/session/{upload_id}',
+                    'X-Goog-Upload-Status': 'active',
+                })
+                return
+            # The final chunk carries the bytes, so that's where upload latency and failures apply
+            if not self.simulate(behaviour=self.files_behaviour):
+                return
+            name = f'files/{uuid.uuid4().hex[:12]}'
+            with self.files_lock:
+                self.files[name] = time.monotonic()
+            self.send_json(200, {'file': self.file_resource(name)}, {'X-Goog-Upload-Status': 'final'})
+            return
+        if ':generateContent' in path:
+            payload = json.loads(body or b'{}')
+            cache_name = payload.get('cachedContent')
+            prompt_tokens, cached_tokens = self.pdf_tokens, 0
+            if cache_name:
+                with self.files_lock:
+                    cache = self.caches.get(cache_name)
+                    alive = cache is not None and cache['expires_at'] > time.monotonic()
+                if not alive:
+                    self.send_json(404, {'error': {'code': 404, 'message': f'Unknown cache {cache_name}',
+                                                   'status': 'NOT_FOUND'}})
+                    return
+                cached_tokens = cache['tokens']
+            else:
+                prompt_tokens += len(json.dumps(payload.get('contents', []))) // 4
+            if not self.simulate():
+                return
+            response_text = self.batch_response(payload) or self.response_text
+            self.send_json(200, {
+                'candidates': [{
+                    'content': {'role': 'model', 'parts': [{'text': response_text}]},
+                    'finishReason': 'STOP',
+                }],
+                'usageMetadata': {
+                    'promptTokenCount': prompt_tokens + cached_tokens,
+                    'cachedContentTokenCount': cached_tokens,
+                    'candidatesTokenCount': len(response_text) // 4,
+                    'totalTokenCount': prompt_tokens + cached_tokens + len(response_text) // 4,
+                },
+            })
+            return
+        self.send_json(404, {'error': {'code': 404, 'message': f'Unknown path {path}'}})
+
+    def batch_response(self, payload):
+        """For a batched call ("Document ID: <id>" parts), answer one entry per document"""
+        doc_ids = [
+            part['text'].split(':', 1)[1].strip()
+            for content in payload.get('contents', [])
+            for part in content.get('parts', [])
+            if part.get('text', '').startswith('Document ID:')
+        ]
+        if not doc_ids:
+            return None
+        course = json.loads(self.response_text)
+        return json.dumps({'documents': [dict(course, id=doc_id) for doc_id in doc_ids]})
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        name = path.split('/v1beta/', 1)[-1]
+        with self.files_lock:
+            known = name in self.files
+        if not self.simulate(behaviour=self.files_behaviour):
+            return
+        if known:
+            self.send_json(200, self.file_resource(name))
+        else:
+            self.send_json(404, {'error': {'code': 404, 'message': f'Unknown file {name}'}})
+
+
+class NotionStubHandler(StubHandler):
+    """Mimics POST /v1/search and POST /v1/pages"""
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        self.read_body()
+        if not self.simulate():
+            return
+        if path == '/v1/search':
+            self.send_json(200, {'object': 'list', 'results': [{'object': 'page', 'id': 'stub-parent'}]})
+        elif path == '/v1/pages':
+            page_id = uuid.uuid4().hex
+            self.send_json(200, {'object': 'page', 'id': page_id, 'url': f'https://www.notion.so/{page_id}'})
+        else:
+            self.send_json(404, {'object': 'error', 'message': f'Unknown path {path}'})
+
+
+def start_server(handler_class, port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_stubs(gemini_port, notion_port, gemini_behaviour, notion_behaviour,
+                response_file=DEFAULT_RESPONSE_FILE, processing_seconds=0.0, cache_min_tokens=0,
+                files_behaviour=None):
+    """
+    Start both stand-ins in background threads; returns (gemini_server, notion_server)
+
+    gemini_behaviour applies to generateContent; files_behaviour (default: instant,
+    never failing) to file uploads and files.get polls.
+    """
+    with open(response_file, 'r', encoding='utf-8') as f:
+        response_text = f.read()
+    gemini_handler = type('GeminiStub', (GeminiStubHandler,), {
+        'behaviour': gemini_behaviour,
+        'files_behaviour': files_behaviour or StubBehaviour(0, 0, 0, 0),
+        'response_text': response_text,
+        'processing_seconds': processing_seconds,
+        'cache_min_tokens': cache_min_tokens,
+    })
+    notion_handler = type('NotionStub', (NotionStubHandler,), {'behaviour': notion_behaviour})
+    return start_server(gemini_handler, gemini_port), start_server(notion_handler, notion_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Gemini and Notion stand-ins')
+    parser.add_argument('--gemini-port', type=int, default=8801)
+    parser.add_argument('--notion-port', type=int, default=8802)
+    parser.add_argument('--latency-ms', type=float, default=800, help='median generateContent latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='lognormal spread (0 = fixed)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 503 responses')
+    parser.add_argument('--quota-rpm', type=int, default=0, help='answer 429 above this many requests/minute')
+    parser.add_argument('--notion-latency-ms', type=float, default=150)
+    parser.add_argument('--notion-error-rate', type=float, default=0.0)
+    parser.add_argument('--notion-quota-rpm', type=int, default=180)
+    parser.add_argument('--upload-latency-ms', type=float, default=0,
+                        help='median latency of file uploads and files.get polls')
+    parser.add_argument('--upload-error-rate', type=float, default=0.0, help='fraction of 503s on file calls')
+    parser.add_argument('--upload-quota-rpm', type=int, default=0, help='answer 429 above this many file calls/minute')
+    parser.add_argument('--processing-seconds', type=float, default=0.0, help='time a file stays PROCESSING')
+    parser.add_argument('--response-file', default=DEFAULT_RESPONSE_FILE, help='JSON returned by generateContent')
+    parser.add_argument('--cache-min-tokens', type=int, default=0,
+                        help='refuse prompt caches smaller than this (to test the inline fallback)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    gemini = StubBehaviour(args.latency_ms, args.latency_sigma, args.error_rate, args.quota_rpm, args.seed)
+    notion = StubBehaviour(args.notion_latency_ms, args.latency_sigma, args.notion_error_rate,
+                           args.notion_quota_rpm, args.seed)
+    files = StubBehaviour(args.upload_latency_ms, args.latency_sigma, args.upload_error_rate,
+                          args.upload_quota_rpm, args.seed)
+    start_stubs(args.gemini_port, args.notion_port, gemini, notion, args.response_file,
+                args.processing_seconds, args.cache_min_tokens, files)
+    print(f"Gemini stand-in on http://127.0.0.1:{args.gemini_port}")
+    print(f"Notion stand-in on http://127.0.0.1:{args.notion_port}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"gemini {gemini.stats}  files {files.stats}  notion {notion.stats}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
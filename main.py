@@ -1,9 +1,9 @@
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
 import os
-import json
 import time
+from backends import get_genai
+from serialization import loads, write_pretty_json
+from model_cascade import MODEL_CASCADE, validate_course_info
+from deadlines import FILE_PROCESSING_TIMEOUT_SECONDS
 
 # --- Configuration ---
 # Set your API key here or in the environment
@@ -65,6 +65,7 @@ Links are important so add every important link possible
 """
 
 def main():
+    genai, types = get_genai()
     client = genai.Client(api_key=API_KEY)
 
     if not os.path.exists(PDF_FILENAME):
@@ -87,7 +88,10 @@ def main():
         
         print(f"Upload complete. File URI: {pdf_file.uri}")
 
+        give_up_at = time.monotonic() + FILE_PROCESSING_TIMEOUT_SECONDS
         while pdf_file.state.name == "PROCESSING":
+            if time.monotonic() >= give_up_at:
+                raise TimeoutError(f"File still processing after {FILE_PROCESSING_TIMEOUT_SECONDS:.0f}s")
             print("Processing file...")
             time.sleep(2)
             pdf_file = client.files.get(name=pdf_file.name)
@@ -96,19 +100,33 @@ def main():
             raise ValueError("File processing failed.")
 
         print("Analyzing document and generating JSON...")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[PROMPT, pdf_file],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
+        # Cheapest model first; only move up the cascade if validation fails
+        for model in MODEL_CASCADE:
+            response = client.models.generate_content(
+                model=model,
+                contents=[PROMPT, pdf_file],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json"
+                )
             )
-        )
 
-        json_content = response.text
-        parsed_data = json.loads(json_content)
+            json_content = response.text
+            try:
+                parsed_data = loads(json_content)
+                problems = validate_course_info(parsed_data)
+            except ValueError as e:
+                parsed_data, problems = None, [f"invalid JSON: {e}"]
+
+            if not problems:
+                break
+            print(f"{model} output failed validation: {'; '.join(problems)}")
+
+        if parsed_data is None:
+            raise ValueError("No model produced valid JSON.")
+        parsed_data['model'] = model
+        print(f"Extracted with {model}")
         
-        with open(OUTPUT_JSON_FILE, "w", encoding="utf-8") as f:
-            json.dump(parsed_data, f, indent=4)
+        write_pretty_json(parsed_data, OUTPUT_JSON_FILE)
 
         print(f"\nSuccess! Data saved to: {OUTPUT_JSON_FILE}")
 
@@ -0,0 +1,185 @@
+# memory_diagnostics.py - Opt-in tracemalloc sampling per pipeline stage and per request
+#
+# Off unless MEMORY_DIAGNOSTICS=1 (tracing slows allocation-heavy code down
+# noticeably). When on, every stage(...) block records how much memory it left
+# behind (retained) and its peak above where it started; every request records
+# its own peak. Peaks come from the process-wide tracemalloc peak, so stages that
+# overlap with other requests can report their neighbours' allocations too.
+import contextvars
+import hmac
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+MEMORY_DIAGNOSTICS = os.getenv('MEMORY_DIAGNOSTICS', '0') == '1'
+MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', '1'))  # more frames make tracing much slower
+MEMORY_ADMIN_TOKEN = os.getenv('MEMORY_ADMIN_TOKEN', '')
+MAX_SNAPSHOTS = 5  # snapshots hold every live trace, so keep only a few
+RECENT_REQUESTS = 50
+
+_lock = threading.Lock()
+_active = set()  # open spans, so each one sees peaks reached while it was open
+_stage_totals = {}  # stage -> {'count', 'retained_bytes', 'max_peak_bytes'}
+_recent = deque(maxlen=RECENT_REQUESTS)
+_snapshots = OrderedDict()  # label -> (wall time, tracemalloc.Snapshot)
+_current_request = contextvars.ContextVar('memory_request', default=None)
+
+# Leave tracemalloc's own bookkeeping out of the reports
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+]
+
+if MEMORY_DIAGNOSTICS and not tracemalloc.is_tracing():
+    tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+class _Span:
+    __slots__ = ('start', 'peak')
+
+    def __init__(self, start):
+        self.start = start
+        self.peak = start
+
+
+def _observe():
+    """Fold the peak since the last observation into every open span (caller holds _lock)"""
+    _, peak = tracemalloc.get_traced_memory()
+    for span in _active:
+        span.peak = max(span.peak, peak)
+    tracemalloc.reset_peak()
+
+
+def _open_span():
+    with _lock:
+        _observe()
+        span = _Span(tracemalloc.get_traced_memory()[0])
+        _active.add(span)
+    return span
+
+
+def _close_span(span):
+    """Returns (retained bytes, peak bytes above the start)"""
+    with _lock:
+        _observe()
+        _active.discard(span)
+        current = tracemalloc.get_traced_memory()[0]
+    return current - span.start, span.peak - span.start
+
+
+@contextmanager
+def stage(name):
+    """Measure one pipeline stage (a no-op unless diagnostics are on)"""
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    span = _open_span()
+    try:
+        yield
+    finally:
+        retained, peak = _close_span(span)
+        with _lock:
+            totals = _stage_totals.setdefault(name, {'count': 0, 'retained_bytes': 0, 'max_peak_bytes': 0})
+            totals['count'] += 1
+            totals['retained_bytes'] += retained
+            totals['max_peak_bytes'] = max(totals['max_peak_bytes'], peak)
+        record = _current_request.get()
+        if record is not None:
+            stages = record['stages'].setdefault(name, {'retained_bytes': 0, 'peak_bytes': 0})
+            stages['retained_bytes'] += retained
+            stages['peak_bytes'] = max(stages['peak_bytes'], peak)
+
+
+@contextmanager
+def track_request(label):
+    """Measure a whole request; stages inside it are listed under it"""
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    record = {'label': label, 'started': time.time(), 'stages': {}}
+    token = _current_request.set(record)
+    span = _open_span()
+    try:
+        yield
+    finally:
+        retained, peak = _close_span(span)
+        _current_request.reset(token)
+        record.update(retained_bytes=retained, peak_bytes=peak)
+        with _lock:
+            _recent.append(record)
+
+
+def check_admin_token(supplied):
+    """True if the supplied token matches MEMORY_ADMIN_TOKEN (never true when it's unset)"""
+    return bool(MEMORY_ADMIN_TOKEN) and hmac.compare_digest(supplied or '', MEMORY_ADMIN_TOKEN)
+
+
+def _take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def _site(trace_or_stat):
+    frame = trace_or_stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def top_sites(limit=20, group_by='lineno'):
+    """Largest live allocation sites right now"""
+    return [
+        {'site': _site(stat), 'size_bytes': stat.size, 'count': stat.count}
+        for stat in _take_snapshot().statistics(group_by)[:limit]
+    ]
+
+
+def save_snapshot(label):
+    """Keep a snapshot under a label for later diffs (oldest dropped past MAX_SNAPSHOTS)"""
+    snapshot = _take_snapshot()
+    with _lock:
+        _snapshots.pop(label, None)
+        _snapshots[label] = (time.time(), snapshot)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {'label': label, 'traced_bytes': sum(stat.size for stat in snapshot.statistics('filename'))}
+
+
+def diff_snapshots(from_label, to_label=None, limit=20, group_by='lineno'):
+    """
+    Allocation growth between two saved snapshots (to_label None = now)
+
+    Returns:
+        tuple: (list of sites sorted by growth, error)
+    """
+    with _lock:
+        old = _snapshots.get(from_label)
+        new = _snapshots.get(to_label) if to_label else None
+    if old is None or (to_label and new is None):
+        return None, f"Unknown snapshot: {from_label if old is None else to_label}"
+    new_snapshot = new[1] if new else _take_snapshot()
+    return [
+        {'site': _site(stat), 'size_diff_bytes': stat.size_diff, 'size_bytes': stat.size,
+         'count_diff': stat.count_diff}
+        for stat in new_snapshot.compare_to(old[1], group_by)[:limit]
+    ], None
+
+
+def report(limit=20, group_by='lineno'):
+    """Stage totals, recent requests and the current top allocation sites"""
+    if not tracemalloc.is_tracing():
+        return {'enabled': False}
+    current, _ = tracemalloc.get_traced_memory()
+    with _lock:
+        stages = {name: dict(totals) for name, totals in _stage_totals.items()}
+        recent = list(_recent)
+        snapshots = {label: taken for label, (taken, _) in _snapshots.items()}
+    return {
+        'enabled': True,
+        'traced_bytes': current,
+        'stages': stages,
+        'recent_requests': recent,
+        'snapshots': snapshots,
+        'top_sites': top_sites(limit, group_by),
+    }
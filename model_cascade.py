@@ -0,0 +1,81 @@
+# model_cascade.py - Try the cheapest model first and escalate only when its output fails validation
+import os
+import threading
+
+# Ordered from fastest/cheapest to strongest
+MODEL_CASCADE = [
+    name.strip()
+    for name in os.getenv('GEMINI_MODELS', 'gemini-flash-lite-latest,gemini-flash-latest').split(',')
+    if name.strip()
+]
+if not MODEL_CASCADE:
+    raise ValueError("GEMINI_MODELS must name at least one model")
+
+# Fields that must be filled in, and lists that must have at least one entry
+REQUIRED_FIELDS = ['code', 'title']
+REQUIRED_NON_EMPTY_LISTS = ['meetings']
+LIST_FIELDS = ['resources', 'contacts', 'homework', 'meetings', 'Important-dates']
+
+
+def validate_course_info(data):
+    """
+    Check extracted data against the course-info schema
+
+    Returns:
+        list: Problems found (empty if the data is usable)
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('course-info'), dict):
+        return ["missing 'course-info' object"]
+
+    course_info = data['course-info']
+    problems = []
+    for field in REQUIRED_FIELDS:
+        value = course_info.get(field)
+        if not isinstance(value, str) or not value.strip():
+            problems.append(f"'{field}' is empty")
+    for field in LIST_FIELDS:
+        value = course_info.get(field)
+        if value is None:
+            if field in REQUIRED_NON_EMPTY_LISTS:
+                problems.append(f"'{field}' is missing")
+            continue
+        if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+            problems.append(f"'{field}' is not a list of objects")
+        elif not value and field in REQUIRED_NON_EMPTY_LISTS:
+            problems.append(f"'{field}' is empty")
+    return problems
+
+
+class CascadeStats:
+    """
+    Per-tier counters: how often each model was tried, accepted, or escalated past
+
+    accepted_invalid counts last-tier output kept even though it failed validation.
+    """
+
+    OUTCOMES = ('accepted', 'accepted_invalid', 'escalated')
+
+    def __init__(self, models):
+        self._lock = threading.Lock()
+        self._counts = {model: self._new_counts() for model in models}
+
+    def _new_counts(self):
+        return dict.fromkeys(('attempts',) + self.OUTCOMES, 0)
+
+    def record(self, model, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(model, self._new_counts())
+            counts['attempts'] += 1
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = {model: dict(c) for model, c in self._counts.items()}
+        results = {model: c['accepted'] + c['accepted_invalid'] for model, c in counts.items()}
+        total_results = sum(results.values())
+        for model, c in counts.items():
+            c['share_of_results'] = results[model] / total_results if total_results else 0.0
+        return counts
+
+
+cascade_stats = CascadeStats(MODEL_CASCADE)
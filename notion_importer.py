@@ -1,65 +1,240 @@
-import requests
+import asyncio
 import json
+import os
+import threading
+import time
+from backends import get_httpx
+from circuit_breaker import CircuitOpenError, is_upstream_failure, notion_breaker
+from deadlines import NOTION_HTTP_TIMEOUT_SECONDS
+from memory_diagnostics import stage
 
-def import_to_notion(markdown_content, notion_api_key):
+NOTION_API_BASE = os.getenv("NOTION_API_BASE", "https://api.notion.com")  # override to use a local stand-in
+NOTION_SEARCH_URL = f"{NOTION_API_BASE}/v1/search"
+NOTION_PAGES_URL = f"{NOTION_API_BASE}/v1/pages"
+NOTION_REQUESTS_PER_SECOND = 3  # Notion's documented average limit per integration
+NOTION_MAX_RETRIES = 3
+BULK_IMPORT_CONCURRENCY = 6
+
+
+class NotionRateLimiter:
+    """Token bucket per integration token, shared by every import in the process"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}  # token -> [available, last_refill]
+    
+    def _reserve(self, token):
+        """Take one slot; return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            available, last = self._buckets.get(token, [self.burst, now])
+            available = min(self.burst, available + (now - last) * self.rate)
+            available -= 1
+            self._buckets[token] = [available, now]
+        return 0 if available >= 0 else -available / self.rate
+    
+    async def wait(self, token):
+        delay = self._reserve(token)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+notion_rate_limiter = NotionRateLimiter(NOTION_REQUESTS_PER_SECOND, NOTION_REQUESTS_PER_SECOND)
+
+
+def notion_headers(notion_api_key):
+    return {
+        "Authorization": f"Bearer {notion_api_key}",
+        "Content-Type": "application/json",
+        "Notion-Version": "2022-06-28"
+    }
+
+
+async def notion_post(client, url, notion_api_key, data):
+    """POST to Notion under the shared rate limit and circuit breaker, retrying on 429"""
+    for attempt in range(NOTION_MAX_RETRIES + 1):
+        notion_breaker.allow()
+        await notion_rate_limiter.wait(notion_api_key)
+        start = time.monotonic()
+        try:
+            response = await client.post(url, headers=notion_headers(notion_api_key), json=data)
+        except Exception as e:
+            notion_breaker.record(success=not is_upstream_failure(e), duration=time.monotonic() - start)
+            raise
+        # 4xx is our request's fault, and 429 is a per-token limit (retried below), not Notion's health
+        healthy = response.status_code < 500
+        notion_breaker.record(success=healthy, duration=time.monotonic() - start)
+        if response.status_code != 429 or attempt == NOTION_MAX_RETRIES:
+            return response
+        await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+
+
+async def find_parent_page(client, notion_api_key):
+    """
+    Return the parent for new pages: the first page the integration can see
+    
+    Returns:
+        tuple: (parent, error_message)
+    """
+    search_data = {
+        "filter": {"property": "object", "value": "page"}
+    }
+    search_response = await notion_post(client, NOTION_SEARCH_URL, notion_api_key, search_data)
+    
+    if search_response.status_code != 200:
+        return None, f"Failed to connect to Notion: {search_response.text}"
+    
+    # Get first available parent or use the workspace root
+    results = search_response.json().get('results', [])
+    if results:
+        return {"page_id": results[0]['id']}, None
+    return {"type": "workspace", "workspace": True}, None
+
+
+async def create_page(client, notion_api_key, parent, title, blocks):
+    """
+    Create a Notion page
+    
+    Returns:
+        tuple: (page_json, error_message)
+    """
+    page_data = {
+        "parent": parent,
+        "properties": {
+            "title": {
+                "title": [{"text": {"content": title}}]
+            }
+        },
+        "children": blocks[:100]  # Notion limit
+    }
+    
+    create_response = await notion_post(client, NOTION_PAGES_URL, notion_api_key, page_data)
+    
+    if create_response.status_code != 200:
+        return None, f"Failed to create page: {create_response.text}"
+    return create_response.json(), None
+
+
+def course_page_title(data, default="Course Syllabus"):
+    """Page title from extracted course data, e.g. 'CPSC 330 Applied Machine Learning'"""
+    course_info = (data or {}).get('course-info') or {}
+    parts = [course_info.get('code'), course_info.get('title')]
+    title = ' '.join(part.strip() for part in parts if isinstance(part, str) and part.strip())
+    return title or default
+
+
+async def import_to_notion_async(markdown_content, notion_api_key, title="Course Syllabus"):
     """
-    Import markdown content to Notion as a new page
+    Import markdown content to Notion as a new page (asyncio version)
     
     Args:
         markdown_content: The populated markdown template
         notion_api_key: User's Notion integration token
+        title: Title for the new page
     
     Returns:
         tuple: (success, page_url, error_message)
+    
+    Raises:
+        CircuitOpenError: The Notion breaker refused a call, so the caller can fall back
     """
     try:
-        # Create a new page in Notion
-        headers = {
-            "Authorization": f"Bearer {notion_api_key}",
-            "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28"
-        }
-        
-        # First, get the user's available pages to find a parent
-        search_url = "https://api.notion.com/v1/search"
-        search_data = {
-            "filter": {"property": "object", "value": "page"}
-        }
-        
-        search_response = requests.post(search_url, headers=headers, json=search_data)
-        
-        if search_response.status_code != 200:
-            return False, None, f"Failed to connect to Notion: {search_response.text}"
+        httpx = get_httpx()
         
-        # Parse markdown into Notion blocks (simplified)
-        blocks = markdown_to_notion_blocks(markdown_content)
+        async with httpx.AsyncClient(timeout=NOTION_HTTP_TIMEOUT_SECONDS) as client:
+            parent, error = await find_parent_page(client, notion_api_key)
+            if error:
+                return False, None, error
+            
+            # Parse markdown into Notion blocks (simplified)
+            blocks = markdown_to_notion_blocks(markdown_content)
+            
+            with stage('notion_create_page'):
+                page, error = await create_page(client, notion_api_key, parent, title, blocks)
         
-        # Get first available parent or use None for workspace root
-        results = search_response.json().get('results', [])
-        parent_id = results[0]['id'] if results else None
+        if error:
+            return False, None, error
         
-        # Create the page
-        create_url = "https://api.notion.com/v1/pages"
-        page_data = {
-            "parent": {"page_id": parent_id} if parent_id else {"type": "workspace", "workspace": True},
-            "properties": {
-                "title": {
-                    "title": [{"text": {"content": "Course Syllabus"}}]
-                }
-            },
-            "children": blocks[:100]  # Notion limit
-        }
+        return True, page.get('url'), None
         
-        create_response = requests.post(create_url, headers=headers, json=page_data)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return False, None, str(e)
+
+def import_to_notion(markdown_content, notion_api_key, title="Course Syllabus"):
+    """Blocking wrapper around import_to_notion_async (same arguments and return value)"""
+    return asyncio.run(import_to_notion_async(markdown_content, notion_api_key, title))
+
+async def import_courses_to_notion_async(courses, notion_api_key, parent_title="Courses",
+                                         concurrency=BULK_IMPORT_CONCURRENCY):
+    """
+    Import many rendered courses as sub-pages of one new parent page
+    
+    Requests run concurrently but all share the per-token rate limiter, so the
+    total time is bounded by Notion's limit rather than by round trips.
+    
+    Args:
+        courses: List of (title, markdown_content) pairs
+        notion_api_key: User's Notion integration token
+        parent_title: Title of the page that will hold all the courses
+        concurrency: Maximum page creations in flight
+    
+    Returns:
+        dict: parent_url, per-course results, elapsed_seconds, pages_per_minute
+              (and error if the parent page could not be created)
+    """
+    httpx = get_httpx()
+    start = time.monotonic()
+    summary = {'parent_url': None, 'results': [], 'elapsed_seconds': 0.0, 'pages_per_minute': 0.0}
+    
+    async with httpx.AsyncClient(timeout=NOTION_HTTP_TIMEOUT_SECONDS) as client:
+        try:
+            parent, error = await find_parent_page(client, notion_api_key)
+            if not error:
+                parent_page, error = await create_page(client, notion_api_key, parent, parent_title, [])
+        except Exception as e:
+            error = str(e)
+        if error:
+            summary['error'] = error
+            return summary
+        summary['parent_url'] = parent_page.get('url')
+        course_parent = {"page_id": parent_page['id']}
         
-        if create_response.status_code != 200:
-            return False, None, f"Failed to create page: {create_response.text}"
+        semaphore = asyncio.Semaphore(concurrency)
         
-        page_url = create_response.json().get('url')
-        return True, page_url, None
+        async def import_one(title, markdown_content):
+            async with semaphore:
+                try:
+                    blocks = markdown_to_notion_blocks(markdown_content)
+                    page, error = await create_page(client, notion_api_key, course_parent, title, blocks)
+                except Exception as e:
+                    page, error = None, str(e)
+            return {
+                'title': title,
+                'success': error is None,
+                'url': page.get('url') if page else None,
+                'error': error
+            }
         
-    except Exception as e:
-        return False, None, str(e)
+        summary['results'] = await asyncio.gather(
+            *(import_one(title, markdown_content) for title, markdown_content in courses)
+        )
+    
+    elapsed = time.monotonic() - start
+    created = sum(1 for result in summary['results'] if result['success'])
+    summary['elapsed_seconds'] = elapsed
+    summary['pages_per_minute'] = created * 60 / elapsed if elapsed else 0.0
+    return summary
+
+def import_courses_to_notion(courses, notion_api_key, parent_title="Courses",
+                             concurrency=BULK_IMPORT_CONCURRENCY):
+    """Blocking wrapper around import_courses_to_notion_async"""
+    return asyncio.run(import_courses_to_notion_async(courses, notion_api_key, parent_title, concurrency))
+
+@stage('notion_blocks')
 def markdown_to_notion_blocks(markdown_content):
     """Convert markdown to Notion blocks with proper table support"""
     blocks = []
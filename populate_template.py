@@ -1,7 +1,8 @@
 # populate_template.py - Populate markdown template with JSON data
-import json
 import os
 from datetime import datetime
+from serialization import load_artifact
+from memory_diagnostics import stage
 
 def format_datetime(dt_string):
     """Convert ISO datetime to readable format"""
@@ -25,20 +26,30 @@ def format_meeting_time(start_time, end_time):
     except:
         return f"{start_time} - {end_time}"
 
-def populate_markdown_template(json_file_path, template_path, output_path):
+# Template text cache, keyed by path (templates are static files)
+_template_cache = {}
+
+def load_template(template_path):
+    """Read a markdown template, caching the text after the first read"""
+    template = _template_cache.get(template_path)
+    if template is None:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            template = f.read()
+        _template_cache[template_path] = template
+    return template
+
+@stage('render_markdown')
+def render_markdown(data, template_path):
     """
-    Populate markdown template with data from JSON
+    Fill a markdown template from already-parsed course data (no file output)
     
     Args:
-        json_file_path: Path to the JSON file with course data
+        data: Parsed JSON dict with a 'course-info' key
         template_path: Path to the markdown template file
-        output_path: Path where the populated markdown will be saved
-    """
-    
-    # Read JSON data
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
     
+    Returns:
+        str: The populated markdown
+    """
     course_info = data.get('course-info', {})
     
     # Extract course information
@@ -46,8 +57,7 @@ def populate_markdown_template(json_file_path, template_path, output_path):
     course_title = course_info.get('title', 'N/A')
     
     # Read template
-    with open(template_path, 'r', encoding='utf-8') as f:
-        template = f.read()
+    template = load_template(template_path)
     
     # Replace course header
     result = template.replace('<placeholder-course-code>', course_code)
@@ -156,6 +166,23 @@ def populate_markdown_template(json_file_path, template_path, output_path):
         resource_table_row = "| <placeholder-link-name> | <placeholder-link-link> |"
         result = result.replace(resource_table_row, '\n'.join(resource_rows))
     
+    return result
+
+def populate_markdown_template(json_file_path, template_path, output_path):
+    """
+    Populate markdown template with data from JSON
+    
+    Args:
+        json_file_path: Path to the JSON file with course data
+        template_path: Path to the markdown template file
+        output_path: Path where the populated markdown will be saved
+    """
+    
+    # Read JSON data (or a packed artifact)
+    data = load_artifact(json_file_path)
+    
+    result = render_markdown(data, template_path)
+    
     # Save the populated markdown
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(result)
@@ -0,0 +1,128 @@
+# prompt_cache.py - Register the fixed instruction prefix once as a Gemini cached context
+#
+# Every extraction sends the same PROMPT ahead of the PDF. With a cached
+# context, the prompt is stored server-side once per model and each call
+# references it by name, so only the document is sent and processed.
+# If caching is unavailable (e.g. the prompt is under the model's minimum
+# cache size), calls fall back to sending the prompt inline.
+import hashlib
+import os
+import threading
+import time
+
+GEMINI_PROMPT_CACHE = os.getenv('GEMINI_PROMPT_CACHE', '1') == '1'
+CACHE_TTL_SECONDS = int(os.getenv('GEMINI_PROMPT_CACHE_TTL', '3600'))
+REFRESH_MARGIN_SECONDS = 300   # extend the TTL when less than this is left
+RETRY_AFTER_FAILURE_SECONDS = 600  # don't retry creating a cache for this long after a failure
+
+
+def is_missing_cache_error(error):
+    """True if a generate call failed because its cached content is gone or invalid (404, or a 400 naming it)"""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if code == 404 or getattr(error, 'status', None) == 'NOT_FOUND':
+        return True
+    message = str(error).lower()
+    return code == 400 and ('cachedcontent' in message or 'cached_content' in message)
+
+
+class PromptCache:
+    """Tracks one cached context per (model, prompt) and falls back when caching fails"""
+
+    def __init__(self, enabled, ttl_seconds):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {}   # (model, prompt hash) -> {'name': str, 'expires_at': float}
+        self._failed_until = {}  # (model, prompt hash) -> monotonic time
+        self._in_flight = set()  # keys with a create/update call under way
+        self.stats = {'hits': 0, 'created': 0, 'refreshed': 0, 'failures': 0, 'fallbacks': 0,
+                      'input_tokens_saved': 0}
+
+    def _key(self, model, prompt):
+        return model, hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    async def get(self, client, types, model, prompt):
+        """
+        Return the cached-content name to reference for this model and prompt
+
+        Returns:
+            str or None: None means send the prompt inline
+        """
+        if not self.enabled:
+            return None
+        key = self._key(model, prompt)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] - now > REFRESH_MARGIN_SECONDS:
+                self.stats['hits'] += 1
+                return entry['name']
+            if key in self._in_flight or (entry is None and now < self._failed_until.get(key, 0)):
+                # Another request is creating or refreshing this cache (only one may, or
+                # concurrent creates would leave orphaned caches behind), or it just failed
+                if entry is not None and entry['expires_at'] > now:
+                    self.stats['hits'] += 1
+                    return entry['name']
+                self.stats['fallbacks'] += 1
+                return None
+            self._in_flight.add(key)
+
+        ttl = f"{self.ttl_seconds}s"
+        try:
+            if entry is not None and entry['expires_at'] > now:
+                await client.aio.caches.update(
+                    name=entry['name'], config=types.UpdateCachedContentConfig(ttl=ttl)
+                )
+                stat = 'refreshed'
+                name = entry['name']
+            else:
+                cached = await client.aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[prompt], display_name='syllabus-extraction-prompt', ttl=ttl
+                    )
+                )
+                stat = 'created'
+                name = cached.name
+        except Exception as e:
+            print(f"Prompt caching unavailable for {model}, sending the prompt inline: {e}")
+            with self._lock:
+                self._in_flight.discard(key)
+                self._entries.pop(key, None)
+                self._failed_until[key] = now + RETRY_AFTER_FAILURE_SECONDS
+                self.stats['failures'] += 1
+                self.stats['fallbacks'] += 1
+            return None
+        except BaseException:
+            # Cancelled mid-call: let the next request try again
+            with self._lock:
+                self._in_flight.discard(key)
+            raise
+
+        with self._lock:
+            self._in_flight.discard(key)
+            self._entries[key] = {'name': name, 'expires_at': now + self.ttl_seconds}
+            self.stats[stat] += 1
+        return name
+
+    def invalidate(self, model, prompt):
+        """Forget a cache the server rejected (e.g. it expired early)"""
+        with self._lock:
+            self._entries.pop(self._key(model, prompt), None)
+
+    def record_usage(self, usage):
+        """Add the cached input tokens reported for a call"""
+        saved = getattr(usage, 'cached_content_token_count', None)
+        if saved:
+            self._count('input_tokens_saved', saved)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, enabled=self.enabled, active_caches=len(self._entries))
+
+
+prompt_cache = PromptCache(GEMINI_PROMPT_CACHE, CACHE_TTL_SECONDS)
@@ -0,0 +1,154 @@
+# result_store.py - Keep extracted course data around so templates can be swapped without re-extraction
+import gzip
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from populate_template import render_markdown
+from due_dates import due_date_index
+
+TEMPLATE_DIR = 'notion_templates'
+TEMPLATE_NAMES = ['modern', 'classic', 'basic']
+MAX_RESULTS = 200  # Oldest results are dropped past this many
+
+_lock = threading.Lock()
+_results = {}  # result_id -> {'data': dict, 'rendered': {template_name: markdown}, 'artifacts': {...}}
+_pdf_index = {}  # sha256 of the uploaded PDF -> latest result_id
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prerender')
+
+
+def template_path_for(template_name):
+    """Return the template file path for a template name, or None if unknown"""
+    if template_name not in TEMPLATE_NAMES:
+        return None
+    path = os.path.join(TEMPLATE_DIR, f'notion_template_{template_name}.md')
+    return path if os.path.exists(path) else None
+
+
+def save_result(extracted_data, page_state=None, pdf_hash=None, replaces=None):
+    """
+    Store extracted data and start pre-rendering every template in the background
+
+    Args:
+        extracted_data: Parsed course data
+        page_state: Page fingerprints and item pages (see incremental.py), if available
+        pdf_hash: Hash of the uploaded PDF, so the result can be served again while Gemini is down
+        replaces: result_id of the earlier version this is a revision of, if any
+    """
+    result_id = uuid.uuid4().hex
+    evicted = []
+    with _lock:
+        _results[result_id] = {'data': extracted_data, 'page_state': page_state, 'rendered': {}, 'artifacts': {}}
+        if pdf_hash:
+            _pdf_index[pdf_hash] = result_id
+        while len(_results) > MAX_RESULTS:
+            # dicts keep insertion order, so the first key is the oldest
+            oldest = next(iter(_results))
+            del _results[oldest]
+            evicted.append(oldest)
+            for key in [key for key, value in _pdf_index.items() if value == oldest]:
+                del _pdf_index[key]
+    # Only this course's deadlines are re-sorted; the term-wide view merges at query time
+    due_date_index.update(result_id, extracted_data, replaces)
+    for oldest in evicted:
+        due_date_index.remove(oldest)
+    _executor.submit(prerender_all, result_id)
+    return result_id
+
+
+def get_data(result_id):
+    """Return the extracted data for a result, or None"""
+    with _lock:
+        entry = _results.get(result_id)
+    return entry['data'] if entry else None
+
+
+def find_result_for_pdf(pdf_hash):
+    """Return the latest result_id extracted from an identical PDF, or None"""
+    with _lock:
+        return _pdf_index.get(pdf_hash)
+
+
+def get_revision_base(result_id):
+    """Return {'data', 'page_state'} for re-extracting a new version of a result, or None"""
+    with _lock:
+        entry = _results.get(result_id)
+    if entry is None:
+        return None
+    return {'data': entry['data'], 'page_state': entry['page_state']}
+
+
+def prerender_all(result_id):
+    """Render and pre-compress every known template for a result (runs on the background pool)"""
+    for template_name in TEMPLATE_NAMES:
+        try:
+            get_artifact(result_id, template_name)
+        except Exception as e:
+            print(f"Pre-render of {template_name} failed for {result_id}: {e}")
+
+
+def get_rendered(result_id, template_name):
+    """
+    Return rendered markdown for a stored result, rendering it on demand if needed
+
+    Returns:
+        tuple: (markdown_content, error)
+    """
+    with _lock:
+        entry = _results.get(result_id)
+        if entry is None:
+            return None, 'Result not found'
+        cached = entry['rendered'].get(template_name)
+    if cached is not None:
+        return cached, None
+
+    template_path = template_path_for(template_name)
+    if template_path is None:
+        return None, 'Template not found'
+
+    markdown_content = render_markdown(entry['data'], template_path)
+    with _lock:
+        entry['rendered'][template_name] = markdown_content
+    return markdown_content, None
+
+
+def get_artifact(result_id, template_name):
+    """
+    Return the downloadable bytes for a rendered result, with a strong ETag
+
+    Compressed variants are built once and cached alongside the plain bytes.
+
+    Returns:
+        tuple: (artifact, error) where artifact is
+               {'etag': str, 'identity': bytes, 'gzip': bytes, 'br': bytes or None}
+    """
+    with _lock:
+        entry = _results.get(result_id)
+        artifact = entry['artifacts'].get(template_name) if entry else None
+    if artifact is not None:
+        return artifact, None
+
+    markdown_content, error = get_rendered(result_id, template_name)
+    if error:
+        return None, error
+
+    body = markdown_content.encode('utf-8')
+    artifact = {
+        'etag': '"' + hashlib.sha256(body).hexdigest() + '"',
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        'br': _brotli_compress(body),
+    }
+    with _lock:
+        entry['artifacts'][template_name] = artifact
+    return artifact, None
+
+
+def _brotli_compress(body):
+    """Brotli is optional; return None when the package isn't installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(body)
@@ -0,0 +1,104 @@
+# serialization.py - JSON/binary serialization for extraction artifacts and API payloads
+#
+# - dumps/loads: compact JSON, using orjson when it is installed
+# - pack/unpack: versioned binary envelope (msgpack when installed, else JSON)
+#   with zlib compression, for stored artifacts
+# - write_pretty_json: indented JSON, only for files people read
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Envelope: MAGIC | version | codec | compression | payload
+MAGIC = b'SYB'
+FORMAT_VERSION = 1
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+HEADER_SIZE = len(MAGIC) + 3
+COMPRESSION_LEVEL = 6
+
+
+class SerializationError(ValueError):
+    """Raised for data that isn't a known artifact format or version"""
+
+
+def dumps(obj):
+    """Compact JSON as bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def pack(obj, compress=True):
+    """Encode obj into the versioned binary artifact format"""
+    if msgpack is not None:
+        codec, payload = CODEC_MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    else:
+        codec, payload = CODEC_JSON, dumps(obj)
+    compression = COMPRESSION_NONE
+    if compress:
+        compression, payload = COMPRESSION_ZLIB, zlib.compress(payload, COMPRESSION_LEVEL)
+    return MAGIC + bytes([FORMAT_VERSION, codec, compression]) + payload
+
+
+def unpack(data):
+    """Decode bytes produced by pack()"""
+    if not is_packed(data):
+        raise SerializationError('Not a packed artifact')
+    version, codec, compression = data[len(MAGIC)], data[len(MAGIC) + 1], data[len(MAGIC) + 2]
+    if version != FORMAT_VERSION:
+        raise SerializationError(f'Unsupported artifact version {version}')
+    payload = data[HEADER_SIZE:]
+    if compression == COMPRESSION_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression != COMPRESSION_NONE:
+        raise SerializationError(f'Unknown compression {compression}')
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise SerializationError('Artifact needs msgpack, which is not installed')
+        return msgpack.unpackb(payload, raw=False)
+    if codec == CODEC_JSON:
+        return loads(payload)
+    raise SerializationError(f'Unknown codec {codec}')
+
+
+def is_packed(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def save_artifact(obj, path):
+    """Write obj to path in the packed binary format"""
+    with open(path, 'wb') as f:
+        f.write(pack(obj))
+
+
+def load_artifact(path):
+    """Read a packed artifact or a plain JSON file (detected from the header)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if is_packed(data):
+        return unpack(data)
+    return loads(data)
+
+
+def write_pretty_json(obj, path):
+    """Indented JSON for human-facing files"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, indent=4)